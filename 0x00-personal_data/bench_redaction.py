@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the users export redaction with 1 to N worker processes
+Usage: ./bench_redaction.py [rows] [batch_size] [max_workers]
+"""
+import os
+import sys
+import time
+
+write_batches = __import__("filtered_logger").write_batches
+
+FIELDS = ("name", "email", "phone", "ssn", "password", "ip", "last_login",
+          "user_agent")
+
+
+def fake_batches(rows: int, batch_size: int):
+    """
+    Yields batches of generated users rows
+    """
+    batch = []
+    for i in range(rows):
+        batch.append((
+            "User {}".format(i), "user{}@example.com".format(i),
+            "(473) 401-4253", "261-72-6780", "K5?BMNv{}".format(i),
+            "60ed:c396:2ff:244:bbd0:9208:26f2:93ea", "2019-11-14 06:14:24",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        ))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    workers = 1
+    baseline = None
+    with open(os.devnull, "w") as devnull:
+        while workers <= (max_workers or 1):
+            start = time.perf_counter()
+            write_batches(FIELDS, fake_batches(rows, batch_size), devnull,
+                          workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print("{} worker(s): {:>9.0f} rows/s  ({:.1f}x)".format(
+                workers, rows / elapsed, baseline / elapsed))
+            workers *= 2
@@ -1,13 +1,67 @@
 #!/usr/bin/env python3
 """filtered_logger module that implements data obfusation"""
-from typing import List
+from contextlib import contextmanager
+from functools import lru_cache
+from collections import deque
+from queue import Empty, Full, LifoQueue, Queue
+from threading import BoundedSemaphore, Event, Lock, Thread
+from typing import Callable, Iterable, Iterator, List, TextIO, Tuple
 import re
 import logging
+import multiprocessing
 import os
+import sys
 import mysql.connector
 
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+_worker_formatter = None
+_db_pool = None
+_db_pool_lock = Lock()
+
+
+class Redactor:
+    """
+    Obfuscates fields of log messages, with the patterns compiled once
+    per (fields, redaction, separator)
+    """
+
+    def __init__(self, fields: List[str], redaction: str, separator: str):
+        """
+        Compile the redaction patterns
+        Args:
+            fields: list of strings indicating fields to obfuscate
+            redaction: what the field will be obfuscated to
+            separator: the character separating the fields
+        """
+        self.fields = tuple(fields)
+        self.redaction = redaction
+        self.separator = separator
+        # one literal-prefixed pattern per field: the regex engine scans
+        # for each prefix faster than it tries an alternation of them all
+        # at every position, and output stays identical to re.sub()
+        self._patterns = [
+            (re.compile(field + "=.*?" + separator),
+             field + "=" + redaction + separator)
+            for field in self.fields
+        ]
+
+    def redact(self, message: str) -> str:
+        """
+        Returns the obfuscated message
+        """
+        for pattern, replacement in self._patterns:
+            message = pattern.sub(replacement, message)
+        return message
+
+
+@lru_cache(maxsize=64)
+def _get_redactor(fields: Tuple[str, ...], redaction: str,
+                  separator: str) -> Redactor:
+    """
+    Returns the Redactor shared by calls with the same arguments
+    """
+    return Redactor(fields, redaction, separator)
 
 
 def filter_datum(
@@ -21,12 +75,7 @@ def filter_datum(
         message: the log line to obfuscate
         separator: the character separating the fields
     """
-    for field in fields:
-        message = re.sub(
-            field + "=.*?" + separator, field + "=" +
-            redaction + separator, message
-        )
-    return message
+    return _get_redactor(tuple(fields), redaction, separator).redact(message)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -40,6 +89,7 @@ class RedactingFormatter(logging.Formatter):
         """initilizes an instance of RedactingFormatter class"""
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.redactor = Redactor(fields, self.REDACTION, self.SEPARATOR)
 
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -49,9 +99,7 @@ class RedactingFormatter(logging.Formatter):
         Return:
             formatted string
         """
-        record.msg = filter_datum(
-            self.fields, self.REDACTION, record.getMessage(), self.SEPARATOR
-        )
+        record.msg = self.redactor.redact(record.getMessage())
         return super(RedactingFormatter, self).format(record)
 
 
@@ -68,35 +116,398 @@ def get_logger() -> logging.Logger:
     return logger
 
 
+def get_db_config() -> dict:
+    """
+    Returns the connection settings from the PERSONAL_DATA_DB_* variables
+    """
+    return {
+        "user": os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
+        "password": os.getenv("PERSONAL_DATA_DB_PASSWORD", "root"),
+        "host": os.getenv("PERSONAL_DATA_DB_HOST", "localhost"),
+        "database": os.getenv("PERSONAL_DATA_DB_NAME", "my_db"),
+    }
+
+
 def get_db() -> mysql.connector.connection.MySQLConnection:
     """
     function that returns a connector to the database
     """
-    user = os.getenv("PERSONAL_DATA_DB_USERNAME", "root")
-    passwd = os.getenv("PERSONAL_DATA_DB_PASSWORD", "root")
-    host = os.getenv("PERSONAL_DATA_DB_HOST", "localhost")
-    db_name = os.getenv("PERSONAL_DATA_DB_NAME", "my_db")
-    conn = mysql.connector.connection.MySQLConnection(
-        user=user, password=passwd, host=host, database=db_name
-    )
+    conn = mysql.connector.connection.MySQLConnection(**get_db_config())
     return conn
 
 
+class ConnectionPool:
+    """
+    Pool of reusable database connections
+    At most size connections are open; idle ones are health-checked
+    (is_connected()) when checked out and replaced if they went stale.
+    Released connections are rolled back first, so no transaction left
+    open is handed to the next caller.
+    """
+
+    def __init__(self, size: int = 5, connect: Callable = None,
+                 config: dict = None):
+        """
+        Initialize the pool, connections are opened on demand
+        Args:
+            size: maximum number of connections
+            connect: connection factory called with config, MySQLConnection
+                     if None
+            config: connection settings, get_db_config() if None
+        """
+        self.size = size
+        self._connect = connect or mysql.connector.connection.MySQLConnection
+        self._config = config if config is not None else get_db_config()
+        self._idle = LifoQueue()
+        self._slots = BoundedSemaphore(size)
+
+    def acquire(self, timeout: float = None):
+        """
+        Checks a connection out of the pool
+        Args:
+            timeout: seconds to wait for a free connection, None waits
+        Return:
+            a connected connection, to give back with release()
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("no free connection in the pool")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except Empty:
+                    return self._connect(**self._config)
+                if self._is_healthy(conn):
+                    return conn
+                self._close(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn) -> None:
+        """
+        Gives a connection back to the pool, after rolling back what it
+        left uncommitted; a connection that fails to roll back or is no
+        longer connected is closed instead of pooled
+        """
+        try:
+            conn.rollback()
+            healthy = conn.is_connected()
+        except Exception:
+            healthy = False
+        if healthy:
+            self._idle.put(conn)
+        else:
+            self._close(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Context manager checking a connection out for the with block
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """
+        Closes the idle connections
+        """
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except Empty:
+                return
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        """
+        Tells whether a pooled connection still works
+        """
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn) -> None:
+        """
+        Closes a connection, ignoring errors of dead ones
+        """
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_db_pool() -> ConnectionPool:
+    """
+    Returns the process-wide pool, created on first use with
+    PERSONAL_DATA_DB_POOL_SIZE connections (default 5)
+    """
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            try:
+                size = int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE"))
+            except Exception:
+                size = 5
+            _db_pool = ConnectionPool(size)
+        return _db_pool
+
+
+def format_row(fields: Tuple[str, ...], row: tuple) -> str:
+    """
+    Returns the log message of one users row
+    """
+    message = "".join(f"{k}={v}; " for k, v in zip(fields, row))
+    return message.strip()
+
+
+def build_users_query(columns: List[str] = None, where: str = None) -> str:
+    """
+    Returns the SELECT statement of an export
+    Args:
+        columns: columns to export, all of them if None
+        where: SQL condition rows must satisfy, may hold %s placeholders
+    """
+    projection = "*"
+    if columns:
+        for column in columns:
+            if not re.fullmatch(r"\w+", column):
+                raise ValueError(f"invalid column name: {column}")
+        projection = ", ".join(f"`{column}`" for column in columns)
+    query = f"SELECT {projection} FROM users"
+    if where:
+        query += f" WHERE {where}"
+    return query + ";"
+
+
+def iter_batches(cursor, batch_size: int) -> Iterator[List[tuple]]:
+    """
+    Yields the rows of an executed cursor, batch_size rows at a time
+    """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def format_batch(formatter: logging.Formatter, fields: Tuple[str, ...],
+                 rows: List[tuple]) -> str:
+    """
+    Returns the redacted log lines of a batch of rows, as one string
+    """
+    lines = []
+    for row in rows:
+        record = logging.LogRecord("user_data", logging.INFO, None, None,
+                                   format_row(fields, row), None, None)
+        lines.append(formatter.format(record))
+    return "\n".join(lines) + "\n"
+
+
+def _init_redaction_worker() -> None:
+    """
+    Creates the formatter of a redaction worker process
+    """
+    global _worker_formatter
+    _worker_formatter = RedactingFormatter(list(PII_FIELDS))
+
+
+def _redact_batch(fields: Tuple[str, ...], rows: List[tuple]) -> str:
+    """
+    Formats a batch of rows in a redaction worker process
+    """
+    return format_batch(_worker_formatter, fields, rows)
+
+
+def _put_until(queue: Queue, item, stop: Event) -> bool:
+    """
+    Puts item in a bounded queue, unless stop is set while waiting
+    Return:
+        True if item was put
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _read_batches(batches: Iterable[List[tuple]], queue: Queue,
+                  stop: Event) -> None:
+    """
+    Reader thread: feeds batches to queue, then None (or the error raised)
+    Stops fetching as soon as stop is set
+    """
+    try:
+        for rows in batches:
+            if not _put_until(queue, rows, stop) or stop.is_set():
+                return
+        _put_until(queue, None, stop)
+    except Exception as e:
+        _put_until(queue, e, stop)
+
+
+def write_batches(fields: Tuple[str, ...], batches: Iterable[List[tuple]],
+                  stream: TextIO, workers: int = 1,
+                  timeout: float = 300) -> int:
+    """
+    Redacts batches of rows and writes them to stream, in order
+    With more than one worker, a reader thread pulls the batches while a
+    pool of worker processes redacts them and this thread writes the
+    results in submission order.
+    Args:
+        fields: column names of the rows
+        batches: iterable of lists of rows
+        stream: where lines are written
+        workers: number of redaction processes, 1 redacts in this thread
+        timeout: seconds to wait for a redacted batch (a worker that died
+                 never returns its batch); TimeoutError is raised and the
+                 pool terminated when it expires
+    Return:
+        number of rows written
+    """
+    count = 0
+    if workers <= 1:
+        formatter = RedactingFormatter(list(PII_FIELDS))
+        for rows in batches:
+            stream.write(format_batch(formatter, fields, rows))
+            stream.flush()
+            count += len(rows)
+        return count
+
+    # bounded queues keep memory flat when the writer is the bottleneck
+    window = 2 * workers
+    pool = multiprocessing.Pool(workers, initializer=_init_redaction_worker)
+    queue = Queue(maxsize=window)
+    stop = Event()
+    reader = Thread(target=_read_batches, args=(batches, queue, stop),
+                    daemon=True)
+    reader.start()
+    pending = deque()
+    try:
+        while True:
+            rows = queue.get()
+            if isinstance(rows, Exception):
+                raise rows
+            if rows is not None:
+                pending.append(pool.apply_async(_redact_batch,
+                                                (fields, rows)))
+                count += len(rows)
+            while pending and (rows is None or len(pending) >= window):
+                try:
+                    lines = pending.popleft().get(timeout)
+                except multiprocessing.TimeoutError:
+                    raise TimeoutError("no redacted batch after {} seconds"
+                                       .format(timeout)) from None
+                stream.write(lines)
+                stream.flush()
+            if rows is None:
+                return count
+    finally:
+        # the reader must be done with batches (and its cursor) before
+        # the caller closes them: unblock its put() and wait for it
+        stop.set()
+        while reader.is_alive():
+            try:
+                while True:
+                    queue.get_nowait()
+            except Empty:
+                pass
+            reader.join(0.1)
+        pool.terminate()
+        pool.join()
+
+
+def export_users(db: mysql.connector.connection.MySQLConnection,
+                 stream: TextIO = None, columns: List[str] = None,
+                 where: str = None, params: tuple = (),
+                 batch_size: int = 1000, workers: int = 1,
+                 timeout: float = 300) -> int:
+    """
+    Streams the users table to stream in the format of get_logger()
+    Rows are fetched from an unbuffered cursor, redacted and written
+    batch_size at a time, so memory does not grow with the table.
+    Args:
+        db: database connection
+        stream: where lines are written, stderr like get_logger() if None
+        columns: columns to export, all of them if None
+        where: SQL condition rows must satisfy, may hold %s placeholders
+        params: values of the placeholders of where
+        batch_size: number of rows fetched and written at once
+        workers: number of redaction processes (see write_batches)
+        timeout: seconds to wait for a redacted batch (see write_batches)
+    Return:
+        number of rows exported
+    """
+    if stream is None:
+        stream = sys.stderr
+    cursor = db.cursor()
+    try:
+        cursor.execute(build_users_query(columns, where), params)
+        fields = cursor.column_names
+        count = write_batches(fields, iter_batches(cursor, batch_size),
+                              stream, workers, timeout)
+    except BaseException:
+        _discard_cursor(db, cursor)
+        raise
+    cursor.close()
+    return count
+
+
+def _discard_cursor(db: mysql.connector.connection.MySQLConnection,
+                    cursor) -> None:
+    """
+    Closes a cursor whose rows may not all have been fetched, because an
+    error interrupted the export: the unread rows are dropped first, as
+    close() would raise "Unread result found", and errors of both are
+    ignored so that they do not hide the one being raised
+    """
+    try:
+        db.consume_results()
+    except Exception:
+        pass
+    try:
+        cursor.close()
+    except Exception:
+        pass
+
+
 def main() -> None:
     """
     Obtains a database connection and retrieves all rows in the users table
     and displays each row under a filtered format
     """
+    try:
+        batch_size = int(os.getenv("PERSONAL_DATA_EXPORT_BATCH_SIZE"))
+    except Exception:
+        batch_size = 1000
+    columns = os.getenv("PERSONAL_DATA_EXPORT_COLUMNS")
+    if columns:
+        columns = [column.strip() for column in columns.split(",")]
+    where = os.getenv("PERSONAL_DATA_EXPORT_WHERE")
+    try:
+        workers = int(os.getenv("PERSONAL_DATA_EXPORT_WORKERS"))
+    except Exception:
+        workers = 1
+    try:
+        timeout = float(os.getenv("PERSONAL_DATA_EXPORT_TIMEOUT"))
+    except Exception:
+        timeout = 300
     db = get_db()
-    logger = get_logger()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    fields = cursor.column_names
-    for row in cursor:
-        message = "".join(f"{k}={v}; " for k, v in zip(fields, row))
-        logger.info(message.strip())
-    cursor.close()
-    db.close()
+    try:
+        export_users(db, columns=columns, where=where,
+                     batch_size=batch_size, workers=workers,
+                     timeout=timeout)
+    finally:
+        db.close()
 
 
 if __name__ == "__main__":
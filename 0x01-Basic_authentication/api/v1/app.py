@@ -6,11 +6,14 @@ from os import getenv
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS
 from api.v1.views import app_views
+from api.v1.auth.auth import compile_excluded_paths
 
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
-app.config["JSONIFY_PRETTYPRINT_REGULAR"] = True
+# pretty-printed JSON responses only on demand: they are much larger
+app.config["JSONIFY_PRETTYPRINT_REGULAR"] = \
+    getenv("API_PRETTYPRINT", "false").lower() in ("1", "true")
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
 if getenv("AUTH_TYPE") == "auth":
@@ -22,6 +25,15 @@ elif getenv("AUTH_TYPE") == "basic_auth":
 
     auth = BasicAuth()
 
+excluded_paths = (
+    "/api/v1/status/",
+    "/api/v1/unauthorized/",
+    "/api/v1/forbidden/",
+)
+if auth:
+    # compiled once here, require_auth() reuses the matcher
+    compile_excluded_paths(excluded_paths)
+
 
 @app.before_request
 def authenticate() -> None:
@@ -29,11 +41,6 @@ def authenticate() -> None:
     filters each request before it's handled by the route handler
     """
     if auth:
-        excluded_paths = [
-            "/api/v1/status/",
-            "/api/v1/unauthorized/",
-            "/api/v1/forbidden/",
-        ]
         if auth.require_auth(request.path, excluded_paths):
             if auth.authorization_header(request) is None:
                 abort(401)
@@ -1,7 +1,32 @@
 #!/usr/bin/env python3
 """module with class to manage the API authentication"""
-from typing import List, TypeVar, Union
+from typing import List, Pattern, Tuple, TypeVar, Union
 import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=32)
+def compile_excluded_paths(excluded_paths: Tuple[str, ...]) -> Pattern:
+    """
+    Compiles excluded paths into a single regex, once per list of paths
+    Args:
+        - excluded_paths(tuple of str): paths that do not require
+          authentication, a trailing '*' matches any suffix
+    Return:
+        - compiled alternation of the paths, None if there are none
+    """
+    patterns = []
+    for exclude in [pat.strip() for pat in excluded_paths]:
+        if exclude[-1] == "*":
+            pattern = "{}.*".format(exclude[0:-1])
+        elif exclude[-1] == "/":
+            pattern = "{}/*".format(exclude[0:-1])
+        else:
+            pattern = "{}/*".format(exclude)
+        patterns.append("(?:{})".format(pattern))
+    if len(patterns) == 0:
+        return None
+    return re.compile("|".join(patterns))
 
 
 class Auth:
@@ -18,16 +43,9 @@ class Auth:
             - True if path is not in excluded_paths, else False
         """
         if path is not None and excluded_paths is not None:
-            for exclude in [pat.strip() for pat in excluded_paths]:
-                pattern = ""
-                if exclude[-1] == "*":
-                    pattern = "{}.*".format(exclude[0:-1])
-                elif exclude[-1] == "/":
-                    pattern = "{}/*".format(exclude[0:-1])
-                else:
-                    pattern = "{}/*".format(exclude)
-                if re.match(pattern, path):
-                    return False
+            matcher = compile_excluded_paths(tuple(excluded_paths))
+            if matcher is not None and matcher.match(path):
+                return False
         return True
 
     def authorization_header(self, request=None) -> Union[str, None]:
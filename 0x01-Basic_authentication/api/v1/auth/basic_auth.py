@@ -1,18 +1,106 @@
 #!/usr/bin/env python3
 """basic_auth module"""
 import re
+import os
+import hmac
+import time
 import binascii
+import hashlib
 from base64 import b64decode
+from collections import OrderedDict
+from threading import Lock
 from typing import TypeVar, Tuple, Union
 from api.v1.auth.auth import Auth
 from models.user import User
 
 
+class CredentialCache:
+    """
+    Bounded LRU cache of verified Authorization headers
+    Headers are stored as a keyed digest (never in clear) and map to the
+    user they authenticated. An entry is dropped once expired, or when
+    the user was removed or changed email or password.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: int = 300):
+        """
+        Initialize the cache
+        Args:
+            max_size (int): maximum number of entries, 0 disables the cache
+            ttl (int): seconds an entry stays valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _digest(self, authorization_header: str) -> bytes:
+        """
+        Return the keyed digest of an Authorization header
+        """
+        return hmac.new(self._key, authorization_header.encode("utf-8"),
+                        hashlib.sha256).digest()
+
+    def get(self, authorization_header: str) -> Union[TypeVar("User"), None]:
+        """
+        Return:
+            - User authenticated by this header, None if not cached
+        """
+        if self.max_size <= 0:
+            return None
+        key = self._digest(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, email, password, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        user = User.get(user_id)
+        if user is None or user.email != email or user.password != password:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return user
+
+    def put(self, authorization_header: str, user: TypeVar("User")):
+        """
+        Remember that a header authenticated user
+        """
+        if self.max_size <= 0:
+            return
+        key = self._digest(authorization_header)
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
 class BasicAuth(Auth):
     """
     Class to implement basic authentication
     """
 
+    def __init__(self):
+        """
+        Initialize the class
+        """
+        try:
+            max_size = int(os.getenv("BASIC_AUTH_CACHE_SIZE"))
+        except Exception:
+            max_size = 1024
+        try:
+            ttl = int(os.getenv("BASIC_AUTH_CACHE_TTL"))
+        except Exception:
+            ttl = 300
+        self.credentials_cache = CredentialCache(max_size, ttl)
+
     def extract_base64_authorization_header(
         self, authorization_header: str
     ) -> Union[str, None]:
@@ -91,11 +179,17 @@ class BasicAuth(Auth):
         """
         auth_header = self.authorization_header(request)
         if auth_header:
+            user = self.credentials_cache.get(auth_header)
+            if user is not None:
+                return user
             token = self.extract_base64_authorization_header(auth_header)
             if token:
                 decoded = self.decode_base64_authorization_header(token)
                 if decoded:
                     email, passwd = self.extract_user_credentials(decoded)
                     if email and passwd:
-                        return self.user_object_from_credentials(email, passwd)
+                        user = self.user_object_from_credentials(email, passwd)
+                        if user is not None:
+                            self.credentials_cache.put(auth_header, user)
+                        return user
         return
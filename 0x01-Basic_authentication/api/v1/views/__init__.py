@@ -2,10 +2,12 @@
 """ DocDocDocDocDocDoc
 """
 from flask import Blueprint
+from models.base import load_models
 
 app_views = Blueprint("app_views", __name__, url_prefix="/api/v1")
 
 from api.v1.views.index import *
 from api.v1.views.users import *
 
-User.load_from_file()
+# MODELS_LOAD: now, in a thread, or on the first request needing users
+load_models(User)
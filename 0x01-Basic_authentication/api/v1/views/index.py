@@ -19,11 +19,14 @@ def stats() -> str:
     """GET /api/v1/stats
     Return:
       - the number of each objects
+      - how the models were loaded, and in how many seconds
     """
+    from models.base import load_metrics
     from models.user import User
 
     stats = {}
     stats["users"] = User.count()
+    stats["models_load"] = load_metrics()
     return jsonify(stats)
 
 
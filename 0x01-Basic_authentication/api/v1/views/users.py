@@ -1,19 +1,52 @@
 #!/usr/bin/env python3
 """ Module of Users views
 """
+import json
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request, url_for
 from models.user import User
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users to return
+      - after: ID of the last user of the previous page
+      - format: ndjson for one JSON user per line, streamed
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, sorted by ID
+      - Link header to the next page if limit left users out
+      - 400 if limit is not a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+    after = request.args.get('after')
+    next_url = None
+    if limit is None:
+        users = User.iter_ordered(after)
+    else:
+        users = User.page(after, limit + 1)
+        if len(users) > limit:
+            users = users[:limit]
+            next_url = url_for('app_views.view_all_users', limit=limit,
+                               after=users[-1].id,
+                               format=request.args.get('format'))
+    if request.args.get('format') == 'ndjson':
+        lines = (json.dumps(user.to_json(), sort_keys=True) + "\n"
+                 for user in users)
+        resp = Response(lines, mimetype='application/x-ndjson')
+    else:
+        resp = jsonify([user.to_json() for user in users])
+    if next_url is not None:
+        resp.headers['Link'] = '<{}>; rel="next"'.format(next_url)
+    return resp
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+""" Benchmark of the models codecs (MODELS_CODEC) over many users
+Usage: ./bench_codec.py [users]
+Runs in a temporary directory; checks that every codec gives the same
+output.
+"""
+import os
+import sys
+import tempfile
+import time
+from models import base
+from models.user import User
+
+
+def timed(fn) -> tuple:
+    """ Return (result of fn(), seconds it took)
+    """
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    os.chdir(tempfile.mkdtemp())
+    User.load_from_file()
+    User.import_objects(
+        User(email="user{}@holberton.io".format(i), first_name="Bob",
+             last_name="Dylan", _password="{:064x}".format(i))
+        for i in range(count))
+    with open(".db_User.json") as f:
+        snapshot = f.read()
+    outputs = {}
+    for name in base.CODECS:
+        base.use_codec(name)
+        _, load = timed(User.load_from_file)
+        users, to_json = timed(lambda: [u.to_json() for u in User.all()])
+        _, save = timed(User.save_to_file)
+        with open(".db_User.json") as f:
+            outputs[name] = (users, f.read())
+        print("{:>8}: load_from_file {:.2f}s, to_json {:.2f}s, "
+              "save_to_file {:.2f}s".format(name, load, to_json, save))
+    for users, saved in outputs.values():
+        assert users == outputs['default'][0] and saved == snapshot
+    print("same output for {} users".format(count))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+""" Convert objects to the MODELS_STORAGE=mmap files
+Usage: ./mmap_convert.py [Class ...]   (User by default)
+Reads .db_<Class>.json (and its journal .db_<Class>.log) and writes
+.db_<Class>.rec, .db_<Class>.heap and .db_<Class>.<attribute>.idx for id
+and each indexed attribute; the API must be stopped. The JSON files are
+left as they are; going back is done with MODELS_STORAGE=mmap
+./bulk_users.py export, then ./bulk_users.py import.
+"""
+import sys
+import time
+from os import path
+from models import base
+from models.mmap_store import MmapStore
+from models.user import User
+
+MODELS = {'User': User}
+
+
+def convert(cls: type) -> int:
+    """ Write the mmap files of cls from its JSON files
+    """
+    s_class = cls.__name__
+    records = {}
+    file_path = ".db_{}.json".format(s_class)
+    if path.exists(file_path):
+        with open(file_path, 'r') as f:
+            records = base.load_json(f)
+    for obj_id, obj_json in cls._journal().read()[0]:
+        if obj_json is None:
+            records.pop(obj_id, None)
+        else:
+            records[obj_id] = obj_json
+    return MmapStore.build(cls, ".db_{}".format(s_class), records.values())
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or ['User']:
+        start = time.perf_counter()
+        count = convert(MODELS[name])
+        print("{}: {} objects in {:.2f}s".format(
+            name, count, time.perf_counter() - start))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+""" Journal module: append-only write-ahead log of object changes
+"""
+from typing import List, Tuple, Union
+from os import path
+import json
+import os
+
+
+class Journal():
+    """ Append-only log of `(id, object JSON)` entries, one per line.
+    An entry with a `None` object records a removal.
+    """
+
+    def __init__(self, file_path: str):
+        """ Initialize a Journal on file_path
+        """
+        self.file_path = file_path
+
+    def append(self, obj_id: str, obj_json: Union[dict, None]):
+        """ Append one entry to the log
+        """
+        line = json.dumps({"id": obj_id, "obj": obj_json})
+        with open(self.file_path, 'a') as f:
+            f.write(line + "\n")
+
+    def read(self, offset: int = 0) -> Tuple[List[tuple], int]:
+        """ Read the entries written after offset
+        Return:
+          - list of (id, object JSON or None) and the offset reached
+        A last line without its newline (interrupted append) is ignored
+        and will be read again once complete.
+        """
+        entries = []
+        if not path.exists(self.file_path):
+            return entries, 0
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries.append((entry.get("id"), entry.get("obj")))
+        return entries, offset
+
+    def size(self) -> int:
+        """ Current size of the log in bytes
+        """
+        if not path.exists(self.file_path):
+            return 0
+        return path.getsize(self.file_path)
+
+    def clear(self):
+        """ Drop every entry (after a snapshot has been written)
+        """
+        if path.exists(self.file_path):
+            os.remove(self.file_path)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+""" Tests of the mmap storage shared by forked processes
+    python3 -m unittest test_mmap_store
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from models import base
+from models.user import User
+
+WORKERS = 4
+SAVES = 3000
+
+
+def run_forked(target, *args) -> list:
+    """ Run target(worker, *args) in WORKERS forked processes at once
+    Return:
+      - the exit status of each process
+    """
+    pids = []
+    for worker in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                target(worker, *args)
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+        pids.append(pid)
+    return [os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+            for pid in pids]
+
+
+class TestForkedMmapStore(unittest.TestCase):
+    """ Processes forked after the store was opened """
+
+    def setUp(self):
+        """ Work in an empty directory with the mmap storage
+        """
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        os.chdir(self.dir)
+        self.storage = base.STORAGE
+        base.STORAGE = 'mmap'
+        User.load_from_file()
+
+    def tearDown(self):
+        """ Close the store and remove its files
+        """
+        base.STORAGE = self.storage
+        base.DATA.pop('User').close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def test_concurrent_saves(self):
+        """ Every object saved by the forked processes is stored once and
+        found by its email
+        """
+        User(email="parent@example.com").save()
+
+        def save(worker: int):
+            for i in range(SAVES):
+                User(email="{}-{}@example.com".format(worker, i)).save()
+
+        self.assertEqual(run_forked(save), [0] * WORKERS)
+        store = User._store()
+        self.assertEqual(len(store), WORKERS * SAVES + 1)
+        for worker in range(WORKERS):
+            for i in range(SAVES):
+                email = "{}-{}@example.com".format(worker, i)
+                self.assertEqual(len(store.candidates({'email': email})), 1)
+
+    def test_concurrent_removes(self):
+        """ Processes removing the same objects do not fail
+        """
+        users = [User(email="{}@example.com".format(i)) for i in range(200)]
+        for user in users:
+            user.save()
+
+        def remove(worker: int):
+            for user in users:
+                user.remove()
+
+        self.assertEqual(run_forked(remove), [0] * WORKERS)
+        self.assertEqual(User.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
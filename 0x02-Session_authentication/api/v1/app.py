@@ -6,11 +6,14 @@ from os import getenv
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS
 from api.v1.views import app_views
+from api.v1.auth.auth import compile_excluded_paths
 
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+# pretty-printed JSON responses only on demand: they are much larger
+app.config['JSONIFY_PRETTYPRINT_REGULAR'] = \
+    getenv('API_PRETTYPRINT', 'false').lower() in ('1', 'true')
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
 if getenv('AUTH_TYPE') == 'auth':
@@ -28,6 +31,19 @@ elif getenv('AUTH_TYPE') == 'session_exp_auth':
 elif getenv('AUTH_TYPE') == 'session_db_auth':
     from api.v1.auth.session_db_auth import SessionDBAuth
     auth = SessionDBAuth()
+elif getenv('AUTH_TYPE') == 'session_store_auth':
+    from api.v1.auth.session_store_auth import SessionStoreAuth
+    auth = SessionStoreAuth()
+
+excluded_paths = (
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/'
+)
+if auth:
+    # compiled once here, require_auth() reuses the matcher
+    compile_excluded_paths(excluded_paths)
 
 
 @app.before_request
@@ -36,12 +52,6 @@ def authenticate() -> None:
     filters each request before it's handled by the route handler
     """
     if auth:
-        excluded_paths = [
-          '/api/v1/status/',
-          '/api/v1/unauthorized/',
-          '/api/v1/forbidden/',
-          '/api/v1/auth_session/login/'
-        ]
         if auth.require_auth(request.path, excluded_paths):
             if auth.authorization_header(request) is None:
                 if auth.session_cookie(request) is None:
@@ -3,12 +3,14 @@
 from uuid import uuid4
 from typing import TypeVar
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_map import ShardedSessionMap
 from models.user import User
 
 
 class SessionAuth(Auth):
     """class to implement session authentication"""
-    user_id_by_session_id = {}
+    # shared by the request threads: per-shard locks, atomic operations
+    user_id_by_session_id = ShardedSessionMap()
 
     def create_session(self, user_id: str = None) -> str:
         """
@@ -60,8 +62,9 @@ class SessionAuth(Auth):
             if session_id_cookie:
                 user_id = self.user_id_for_session_id(session_id_cookie)
                 if user_id:
-                    del self.user_id_by_session_id[session_id_cookie]
-                    return True
+                    # a concurrent logout may have removed it meanwhile
+                    sessions = self.user_id_by_session_id
+                    return sessions.pop(session_id_cookie, None) is not None
                 return False
             return False
         return False
@@ -26,6 +26,7 @@ class SessionDBAuth(SessionExpAuth):
             "user_id": user_id,
             "session_id": session_id
         }
+        UserSession.refresh_from_file()
         user = UserSession(**kw)
         user.save()
         return session_id
@@ -39,7 +40,7 @@ class SessionDBAuth(SessionExpAuth):
             user id or None if session_id is None or not a string
         """
         if session_id:
-            UserSession.load_from_file()
+            UserSession.refresh_from_file()
             user_session = UserSession.search({"session_id": session_id})
             if user_session:
                 user_session = user_session[0]
@@ -62,6 +63,7 @@ class SessionDBAuth(SessionExpAuth):
         session_id = self.session_cookie(request)
         if not session_id:
             return False
+        UserSession.refresh_from_file()
         user_session = UserSession.search({"session_id": session_id})
         if user_session:
             user_session[0].remove()
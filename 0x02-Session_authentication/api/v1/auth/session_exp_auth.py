@@ -2,8 +2,10 @@
 """
 Define SessionExpAuth class
 """
+import heapq
 import os
 from datetime import datetime, timedelta
+from threading import Lock
 from .session_auth import SessionAuth
 
 
@@ -11,7 +13,16 @@ class SessionExpAuth(SessionAuth):
     """
     Definition of class SessionExpAuth that adds an
     expiration date to a Session ID
+    Expired sessions are evicted from user_id_by_session_id by a sweep
+    that runs with create_session() and user_id_for_session_id(): a heap
+    ordered by expiry time gives the expired ones in O(log n) each.
     """
+    # (expires_at, session_id, session_dictionary) of expiring sessions
+    expiry_heap = []
+    expiry_lock = Lock()
+    # heap size that triggers the next compaction
+    expiry_compact_at = 64
+
     def __init__(self):
         """
         Initialize the class
@@ -36,8 +47,56 @@ class SessionExpAuth(SessionAuth):
             "created_at": datetime.now()
         }
         self.user_id_by_session_id[session_id] = session_dictionary
+        if self.session_duration > 0:
+            expires_at = session_dictionary["created_at"] + timedelta(
+                seconds=self.session_duration)
+            with self.expiry_lock:
+                heapq.heappush(self.expiry_heap,
+                               (expires_at, session_id, session_dictionary))
+                if len(self.expiry_heap) > SessionExpAuth.expiry_compact_at:
+                    self._compact_expiry_heap()
+        self.sweep_expired_sessions()
         return session_id
 
+    def sweep_expired_sessions(self) -> int:
+        """
+        Remove the expired sessions from user_id_by_session_id
+        Return:
+            number of sessions removed
+        """
+        heap = self.expiry_heap
+        sessions = self.user_id_by_session_id
+        removed = 0
+        now = datetime.now()
+        try:
+            # unlocked peek: most calls have nothing to do, and must not
+            # all queue on the lock
+            if heap[0][0] >= now:
+                return 0
+        except IndexError:
+            return 0
+        with self.expiry_lock:
+            while heap and heap[0][0] < now:
+                _, session_id, session_dictionary = heapq.heappop(heap)
+                # the session may be gone (destroyed) or replaced already
+                if sessions.discard(session_id, session_dictionary):
+                    removed += 1
+            SessionExpAuth.expiry_compact_at = max(64, 2 * len(heap))
+        return removed
+
+    def _compact_expiry_heap(self):
+        """
+        Drop the heap entries of sessions already destroyed (they would
+        stay until their expiry time), with expiry_lock held
+        Compactions happen each time the heap doubles: O(1) amortized.
+        """
+        heap = self.expiry_heap
+        sessions = self.user_id_by_session_id
+        heap[:] = [entry for entry in heap
+                   if sessions.get(entry[1]) is entry[2]]
+        heapq.heapify(heap)
+        SessionExpAuth.expiry_compact_at = max(64, 2 * len(heap))
+
     def user_id_for_session_id(self, session_id=None):
         """
         Returns a user ID based on a session ID
@@ -48,6 +107,7 @@ class SessionExpAuth(SessionAuth):
         """
         if session_id is None:
             return None
+        self.sweep_expired_sessions()
         user_details = self.user_id_by_session_id.get(session_id)
         if user_details is None:
             return None
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Define ShardedSessionMap class
+"""
+from threading import Lock
+from typing import Any, Iterator
+
+_MISSING = object()
+
+
+class ShardedSessionMap:
+    """
+    Thread-safe dict of sessions, split in shards by key hash
+    Every operation locks only the shard of its key, so threads working on
+    different sessions rarely wait for each other. Each operation is
+    atomic: pop() and discard() are safe check-then-delete.
+    """
+
+    def __init__(self, shards: int = 16):
+        """
+        Initialize the map
+        Args:
+            shards (int): number of shards (and locks)
+        """
+        self._count = shards
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [Lock() for _ in range(shards)]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Return the value of key, default if there is none
+        """
+        i = hash(key) % self._count
+        with self._locks[i]:
+            return self._shards[i].get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        """
+        Return the value of key, raise KeyError if there is none
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        """
+        Set the value of key
+        """
+        i = hash(key) % self._count
+        with self._locks[i]:
+            self._shards[i][key] = value
+
+    def __delitem__(self, key: str):
+        """
+        Remove key, raise KeyError if it is missing
+        """
+        self.pop(key)
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Whether key has a value
+        """
+        return self.get(key, _MISSING) is not _MISSING
+
+    def pop(self, key: str, default: Any = _MISSING) -> Any:
+        """
+        Remove key and return its value (or default if it is missing)
+        """
+        i = hash(key) % self._count
+        with self._locks[i]:
+            if default is _MISSING:
+                return self._shards[i].pop(key)
+            return self._shards[i].pop(key, default)
+
+    def discard(self, key: str, value: Any) -> bool:
+        """
+        Remove key only if its value is value (the same object)
+        Return:
+            True if key was removed
+        """
+        i = hash(key) % self._count
+        with self._locks[i]:
+            if self._shards[i].get(key, _MISSING) is not value:
+                return False
+            del self._shards[i][key]
+            return True
+
+    def __len__(self) -> int:
+        """
+        Number of keys
+        """
+        return sum(len(shard) for shard in self._shards)
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over a snapshot of the keys, shard by shard
+        """
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                keys = list(shard)
+            yield from keys
+
+    def clear(self):
+        """
+        Remove every key
+        """
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                shard.clear()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Session stores: where SessionStoreAuth keeps its sessions
+- MemorySessionStore: in the process (one store per worker)
+- SQLiteSessionStore: in a SQLite database in WAL mode, shared by the
+  workers of one host
+- RedisSessionStore: in a Redis server (or anything speaking its
+  protocol), shared by every worker that can reach it
+All of them find a session by ID in O(1) (hash, primary key index or
+Redis key) and expire sessions after their TTL for every worker.
+"""
+from abc import ABC, abstractmethod
+import heapq
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from typing import Union
+from urllib.parse import urlparse
+from api.v1.auth.session_map import ShardedSessionMap
+
+
+class SessionStore(ABC):
+    """
+    Interface of the session stores
+    A ttl <= 0 means the session never expires.
+    """
+
+    @abstractmethod
+    def create(self, session_id: str, user_id: str, ttl: int = 0):
+        """
+        Store the session session_id of user_id for ttl seconds
+        """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Return the user ID of a live session, None if there is none
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session
+        Return:
+            True if a live session was removed
+        """
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in a dict of the process, expired through a heap ordered by
+    expiry time (as SessionExpAuth does)
+    """
+
+    def __init__(self):
+        """
+        Initialize the store
+        """
+        self._sessions = ShardedSessionMap()
+        # (expires_at, session_id, entry) of the sessions with a ttl
+        self._expiry_heap = []
+        self._lock = threading.Lock()
+
+    def create(self, session_id: str, user_id: str, ttl: int = 0):
+        """
+        Store the session session_id of user_id for ttl seconds
+        """
+        now = time.time()
+        entry = (user_id, now + ttl if ttl > 0 else None)
+        self._sessions[session_id] = entry
+        with self._lock:
+            if ttl > 0:
+                heapq.heappush(self._expiry_heap,
+                               (entry[1], session_id, entry))
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                _, expired_id, expired = heapq.heappop(heap)
+                self._sessions.discard(expired_id, expired)
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Return the user ID of a live session, None if there is none
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            self._sessions.discard(session_id, entry)
+            return None
+        return entry[0]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session
+        """
+        entry = self._sessions.pop(session_id, None)
+        return entry is not None and \
+            (entry[1] is None or entry[1] > time.time())
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite table: session_id is the primary key, expired
+    sessions are deleted through an index on expires_at
+    WAL mode lets every worker read while one writes.
+    """
+
+    def __init__(self, path: str, sweep_every: int = 1000):
+        """
+        Initialize the store
+        Args:
+            path (str): database file
+            sweep_every (int): delete expired sessions every this many
+                               sessions created by the process
+        """
+        self.path = path
+        self.sweep_every = sweep_every
+        self._created = 0
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, "
+            "expires_at REAL)")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_expires_at "
+            "ON sessions (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Connection of the current thread (and process: a connection
+        inherited through fork() is never reused)
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def create(self, session_id: str, user_id: str, ttl: int = 0):
+        """
+        Store the session session_id of user_id for ttl seconds
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, user_id, now + ttl if ttl > 0 else None))
+        self._created += 1
+        if self._created % self.sweep_every == 0:
+            connection.execute(
+                "DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Return the user ID of a live session, None if there is none
+        """
+        row = self._connection().execute(
+            "SELECT user_id FROM sessions WHERE session_id = ? AND "
+            "(expires_at IS NULL OR expires_at > ?)",
+            (session_id, time.time())).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session
+        """
+        cursor = self._connection().execute(
+            "DELETE FROM sessions WHERE session_id = ? AND "
+            "(expires_at IS NULL OR expires_at > ?)",
+            (session_id, time.time()))
+        return cursor.rowcount > 0
+
+
+class RedisError(Exception):
+    """Error reply of a Redis server"""
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions as Redis keys, expired by the server (SET ... EX ttl)
+    Speaks the Redis protocol (RESP) directly over a socket per thread.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379,
+                 db: int = 0, prefix: str = "session:"):
+        """
+        Initialize the store
+        Args:
+            host (str), port (int), db (int): Redis server and database
+            prefix (str): prefix of the keys of the sessions
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self._local = threading.local()
+
+    def _connect(self):
+        """
+        Open the connection of the current thread
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=5)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.socket = sock
+        self._local.reader = sock.makefile("rb")
+        self._local.pid = os.getpid()
+        if self.db:
+            self._write("SELECT", str(self.db))
+            self._reply()
+
+    def _close(self):
+        """
+        Close the connection of the current thread
+        """
+        sock = getattr(self._local, "socket", None)
+        self._local.socket = None
+        if sock is not None:
+            sock.close()
+
+    def _stale(self) -> bool:
+        """
+        True if the connection of the current thread was closed by the
+        server while idle (it is readable although no reply is expected)
+        """
+        return bool(select.select([self._local.socket], [], [], 0)[0])
+
+    def _write(self, *args: str):
+        """
+        Send one command
+        """
+        command = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            arg = arg.encode("utf-8")
+            command.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._local.socket.sendall(b"".join(command))
+
+    def _reply(self):
+        """
+        Read one reply
+        """
+        line = self._local.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by the server")
+        kind, value = line[:1], line[1:-2]
+        if kind == b"+":
+            return value.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(value.decode("utf-8"))
+        if kind == b":":
+            return int(value)
+        if kind == b"$":
+            if int(value) < 0:
+                return None
+            data = self._local.reader.read(int(value) + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            return [self._reply() for _ in range(max(int(value), 0))]
+        raise ConnectionError("invalid reply {!r}".format(line))
+
+    def command(self, *args: str):
+        """
+        Run a command, on a new connection if the thread has none (or the
+        one it had broke)
+        The command is sent again only when sending it failed: once it is
+        sent, the server may have run it, and a lost reply is an error.
+        """
+        for attempt in range(2):
+            try:
+                if getattr(self._local, "socket", None) is None or \
+                        self._local.pid != os.getpid():
+                    self._connect()
+                elif self._stale():
+                    self._close()
+                    self._connect()
+                self._write(*args)
+            except OSError:
+                self._close()
+                if attempt == 1:
+                    raise
+                continue
+            try:
+                return self._reply()
+            except OSError:
+                self._close()
+                raise
+
+    def create(self, session_id: str, user_id: str, ttl: int = 0):
+        """
+        Store the session session_id of user_id for ttl seconds
+        """
+        if ttl > 0:
+            self.command("SET", self.prefix + session_id, user_id,
+                         "EX", str(ttl))
+        else:
+            self.command("SET", self.prefix + session_id, user_id)
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Return the user ID of a live session, None if there is none
+        """
+        return self.command("GET", self.prefix + session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session
+        """
+        return self.command("DEL", self.prefix + session_id) > 0
+
+
+def get_session_store() -> SessionStore:
+    """
+    Session store selected by SESSION_STORE:
+    - memory (default)
+    - sqlite: database file SESSION_STORE_PATH (.db_sessions.sqlite3)
+    - redis: server SESSION_STORE_URL (redis://127.0.0.1:6379/0)
+    """
+    kind = os.getenv("SESSION_STORE", "memory")
+    if kind == "sqlite":
+        return SQLiteSessionStore(
+            os.getenv("SESSION_STORE_PATH", ".db_sessions.sqlite3"))
+    if kind == "redis":
+        url = urlparse(os.getenv("SESSION_STORE_URL",
+                                 "redis://127.0.0.1:6379/0"))
+        return RedisSessionStore(url.hostname or "127.0.0.1",
+                                 url.port or 6379,
+                                 int(url.path.strip("/") or 0))
+    if kind == "memory":
+        return MemorySessionStore()
+    raise ValueError("unknown SESSION_STORE {}".format(kind))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Define SessionStoreAuth class
+"""
+from uuid import uuid4
+from .session_exp_auth import SessionExpAuth
+from .session_store import get_session_store
+
+
+class SessionStoreAuth(SessionExpAuth):
+    """
+    Definition of SessionStoreAuth class that keeps sessions in the
+    session store selected by SESSION_STORE (memory, sqlite or redis),
+    expiring them after SESSION_DURATION seconds
+    With the sqlite or redis store, every worker sees the sessions
+    created by the others.
+    """
+
+    def __init__(self):
+        """
+        Initialize the class
+        """
+        super().__init__()
+        self.store = get_session_store()
+
+    def create_session(self, user_id=None):
+        """
+        Create a Session ID for a user_id
+        Args:
+            user_id (str): user id
+        """
+        if not user_id or not isinstance(user_id, str):
+            return None
+        session_id = str(uuid4())
+        self.store.create(session_id, user_id, self.session_duration)
+        return session_id
+
+    def user_id_for_session_id(self, session_id=None):
+        """
+        Returns a user ID based on a session ID
+        Args:
+            session_id (str): session ID
+        Return:
+            user id or None if session_id is None or not a string
+        """
+        if session_id and isinstance(session_id, str):
+            return self.store.get(session_id)
+        return None
+
+    def destroy_session(self, request=None):
+        """
+        Deletes a user session
+        """
+        if request is None:
+            return False
+        session_id = self.session_cookie(request)
+        if not session_id:
+            return False
+        return self.store.delete(session_id)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+""" Memory benchmark: bytes per User and UserSession object
+Usage: ./bench_memory.py [objects]
+Compares the models with objects holding the same attributes in a
+per-instance __dict__, as the models did before __slots__.
+"""
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+from models import base
+from models.user import User
+from models.user_session import UserSession
+
+
+class DictObject:
+    """ Model object with its attributes in a __dict__
+    """
+
+    fields = ()
+
+    def __init__(self, **kwargs: dict):
+        """ Set the attributes of kwargs like Base.__init__
+        """
+        self.id = kwargs['id']
+        self.created_at = base.parse_timestamp(kwargs['created_at'])
+        self.updated_at = base.parse_timestamp(kwargs['updated_at'])
+        for field in self.fields:
+            setattr(self, field, kwargs.get(field))
+
+
+def dict_model(cls: type) -> type:
+    """ DictObject class with the attributes of the model cls
+    """
+    fields = cls._slot_names()[len(base.Base.__slots__):]
+    return type("Dict" + cls.__name__, (DictObject,), {'fields': fields})
+
+
+def bytes_per_object(make, records: list) -> float:
+    """ Average memory allocated by make(**record) for each record
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objs = [make(**record) for record in records]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del objs
+    return size / len(records)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    now = datetime.utcnow().strftime(base.TIMESTAMP_FORMAT)
+    users = [{'id': str(uuid.uuid4()), 'created_at': now, 'updated_at': now,
+              'email': "user{}@holberton.io".format(i),
+              '_password': "{:064x}".format(i), 'first_name': "Bob",
+              'last_name': None} for i in range(count)]
+    sessions = [{'id': str(uuid.uuid4()), 'created_at': now,
+                 'updated_at': now, 'user_id': user['id'],
+                 'session_id': str(uuid.uuid4())} for user in users]
+    for cls, records in ((User, users), (UserSession, sessions)):
+        before = bytes_per_object(dict_model(cls), records)
+        after = bytes_per_object(cls, records)
+        # the attribute values (strings) are the records', allocated before
+        print("{:>11}: {:.0f} bytes per object with a __dict__, {:.0f} with "
+              "__slots__ (-{:.0f}%)".format(cls.__name__, before, after,
+                                            100 * (1 - after / before)))
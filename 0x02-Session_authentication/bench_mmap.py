@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+""" Storage benchmark: json vs mmap
+Usage: MODELS_STORAGE=json|mmap ./bench_mmap.py [lookups]
+Run in a directory holding .db_User.json (and, for mmap, the files made
+by ./mmap_convert.py). Measures the cold start (load_from_file()), the
+memory it takes, then User.get(id) and email search()es of random users.
+"""
+import random
+import resource
+import sys
+import time
+from models import base
+from models.user import User
+
+
+def rss_mb() -> float:
+    """ Peak resident memory of the process in MB
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    before = rss_mb()
+    start = time.perf_counter()
+    User.load_from_file()
+    load = time.perf_counter() - start
+    memory = rss_mb() - before
+    count = User.count()
+    # a sample of users: a full scan in mmap storage, done after measuring
+    users = random.sample(User.all(), min(lookups, count))
+    start = time.perf_counter()
+    for user in users:
+        assert User.get(user.id).id == user.id
+    get = time.perf_counter() - start
+    start = time.perf_counter()
+    for user in users:
+        assert User.search({'email': user.email})[0].id == user.id
+    search = time.perf_counter() - start
+    print("{}: {} users, load_from_file {:.3f}s (+{:.0f} MB), get {:.1f}us, "
+          "search by email {:.1f}us".format(
+              base.STORAGE, count, load, memory,
+              get / len(users) * 1e6, search / len(users) * 1e6))
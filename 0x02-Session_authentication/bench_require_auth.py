@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Benchmark of Auth.require_auth: per-request regex building (before)
+against the matcher compiled once per list of excluded paths (after)
+"""
+import random
+import re
+import timeit
+from api.v1.auth.auth import Auth
+from api.v1.app import excluded_paths
+
+
+def require_auth_before(path, excluded_paths):
+    """ require_auth as it was: one pattern built and matched per path
+    """
+    if path is not None and excluded_paths is not None:
+        for exclude in [pat.strip() for pat in excluded_paths]:
+            pattern = ''
+            if exclude[-1] == '*':
+                pattern = '{}.*'.format(exclude[0:-1])
+            elif exclude[-1] == '/':
+                pattern = '{}/*'.format(exclude[0:-1])
+            else:
+                pattern = '{}/*'.format(exclude)
+            if re.match(pattern, path):
+                return False
+    return True
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    prefixes = ['/api/v1/status', '/api/v1/users', '/api/v1/forbidden',
+                '/api/v1/auth_session/login', '/api/v1/stats', '/api/v1/st']
+    paths = ["{}{}".format(random.choice(prefixes),
+                           random.choice(['', '/', '/x', '//', 's/1']))
+             for _ in range(10000)]
+    auth = Auth()
+    for excluded in (list(excluded_paths), ['/api/v1/stat*']):
+        assert [require_auth_before(p, excluded) for p in paths] == \
+            [auth.require_auth(p, excluded) for p in paths]
+
+    before = timeit.timeit(
+        lambda: [require_auth_before(p, excluded_paths) for p in paths],
+        number=10)
+    after = timeit.timeit(
+        lambda: [auth.require_auth(p, excluded_paths) for p in paths],
+        number=10)
+    print("10k paths, before: {:.2f} ms".format(before * 100))
+    print("10k paths, after:  {:.2f} ms".format(after * 100))
+    print("speedup: {:.1f}x".format(before / after))
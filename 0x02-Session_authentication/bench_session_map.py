@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+""" Contention benchmark of the session map of SessionAuth
+Usage: ./bench_session_map.py [seconds] [max_threads]
+Each thread loops on: create a session, look it up 8 times, destroy it;
+sessions of the other threads are looked up too. Compares one dict behind
+a global lock with ShardedSessionMap, then checks that concurrent destroys
+of the same sessions succeed exactly once each.
+"""
+import sys
+import time
+from threading import Lock, Thread
+from uuid import uuid4
+from api.v1.auth.session_map import ShardedSessionMap
+
+
+class LockedDict:
+    """ dict behind one global lock
+    """
+
+    def __init__(self):
+        """ Initialize the dict and its lock
+        """
+        self._dict = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """ Value of key
+        """
+        with self._lock:
+            return self._dict.get(key, default)
+
+    def __setitem__(self, key, value):
+        """ Set the value of key
+        """
+        with self._lock:
+            self._dict[key] = value
+
+    def pop(self, key, default=None):
+        """ Remove key and return its value
+        """
+        with self._lock:
+            return self._dict.pop(key, default)
+
+
+def worker(sessions, shared: list, deadline: float, counts: list):
+    """ Create, look up and destroy sessions until deadline
+    """
+    ops = 0
+    while time.monotonic() < deadline:
+        session_id = str(uuid4())
+        sessions[session_id] = "user"
+        shared.append(session_id)
+        for i in range(8):
+            sessions.get(shared[-1 - i % len(shared)])
+        sessions.pop(session_id, None)
+        ops += 10
+    counts.append(ops)
+
+
+def run(sessions, threads: int, seconds: float) -> float:
+    """ Operations per second of threads workers on sessions
+    """
+    counts = []
+    shared = ["none"]
+    deadline = time.monotonic() + seconds
+    workers = [Thread(target=worker,
+                      args=(sessions, shared, deadline, counts))
+               for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(counts) / seconds
+
+
+def check_destroy(threads: int) -> bool:
+    """ Destroy the same sessions from all threads at once: each must be
+    destroyed exactly once
+    """
+    sessions = ShardedSessionMap()
+    ids = [str(uuid4()) for _ in range(10000)]
+    for session_id in ids:
+        sessions[session_id] = "user"
+    destroyed = []
+
+    def destroy():
+        destroyed.append(sum(sessions.pop(session_id, None) is not None
+                             for session_id in ids))
+
+    workers = [Thread(target=destroy) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(destroyed) == len(ids) and len(sessions) == 0
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    threads = 1
+    while threads <= max_threads:
+        locked = run(LockedDict(), threads, seconds)
+        sharded = run(ShardedSessionMap(), threads, seconds)
+        print("{:>2} thread(s): global lock {:>9.0f} ops/s, sharded {:>9.0f} "
+              "ops/s".format(threads, locked, sharded))
+        threads *= 2
+    print("concurrent destroys:",
+          "each once" if check_destroy(max_threads) else "FAILED")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Benchmark of the session stores of SessionStoreAuth
+Usage: ./bench_session_store.py [seconds] [workers]
+For each store: lookups per second of worker processes sharing it, then
+whether a session created by one worker is seen by another, and whether
+a session expires after its TTL. The redis store talks to
+SESSION_STORE_URL, or to a mini_redis.py started for the benchmark.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+from uuid import uuid4
+from api.v1.auth.session_store import (MemorySessionStore,
+                                       RedisSessionStore,
+                                       SQLiteSessionStore)
+
+
+def lookups(store, session_ids: list, seconds: float, counts):
+    """ Look up sessions of session_ids until seconds have passed
+    """
+    ops = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for session_id in session_ids[ops % len(session_ids):][:100]:
+            store.get(session_id)
+        ops += 100
+    counts.put(ops)
+
+
+def create(store, session_id: str):
+    """ Create session_id in another process
+    """
+    store.create(session_id, "user", 60)
+
+
+def run(store, workers: int, seconds: float) -> float:
+    """ Lookups per second of workers processes on store
+    """
+    session_ids = [str(uuid4()) for _ in range(1000)]
+    for session_id in session_ids:
+        store.create(session_id, "user", 60)
+    counts = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+        target=lookups, args=(store, session_ids, seconds, counts))
+        for _ in range(workers)]
+    for p in processes:
+        p.start()
+    total = sum(counts.get() for _ in processes)
+    for p in processes:
+        p.join()
+    return total / seconds
+
+
+def shared(store) -> bool:
+    """ Whether a session created by another process is seen here
+    """
+    session_id = str(uuid4())
+    p = multiprocessing.Process(target=create, args=(store, session_id))
+    p.start()
+    p.join()
+    return store.get(session_id) == "user"
+
+
+def expires(store) -> bool:
+    """ Whether a session is gone after its TTL
+    """
+    session_id = str(uuid4())
+    store.create(session_id, "user", 1)
+    alive = store.get(session_id) == "user"
+    time.sleep(1.1)
+    return alive and store.get(session_id) is None
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    multiprocessing.set_start_method("fork")
+    server = None
+    url = os.getenv("SESSION_STORE_URL")
+    if url is None:
+        server = subprocess.Popen([sys.executable, "mini_redis.py", "6390"])
+        url = "redis://127.0.0.1:6390/0"
+        time.sleep(0.5)
+    url = urlparse(url)
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = (
+            ("memory", MemorySessionStore()),
+            ("sqlite", SQLiteSessionStore(os.path.join(tmp, "s.sqlite3"))),
+            ("redis", RedisSessionStore(url.hostname, url.port or 6379,
+                                        int(url.path.strip("/") or 0))),
+        )
+        try:
+            for name, store in stores:
+                print("{:>6}: {:>8.0f} lookups/s ({} workers), shared by "
+                      "workers: {}, expires: {}".format(
+                          name, run(store, workers, seconds), workers,
+                          "yes" if shared(store) else "no",
+                          "yes" if expires(store) else "no"))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+""" Bulk import and export of users
+Usage:
+    ./bulk_users.py import <file>
+    ./bulk_users.py export [file]
+import reads user objects from a JSONL file, or from a CSV file with a
+header if <file> ends with .csv; a record may hold the password in clear
+(password) or already hashed (_password). Users are written to
+.db_User.json once, at the end. export writes every user as one JSON
+line. - (the default of export) is the standard input or output.
+"""
+import csv
+import json
+import sys
+from typing import IO, Iterator
+from models.user import User
+
+
+def read_records(stream: IO, is_csv: bool) -> Iterator[dict]:
+    """ Yield the records of a JSONL or CSV stream
+    """
+    if is_csv:
+        for row in csv.DictReader(stream):
+            yield {k: v for k, v in row.items() if v != ''}
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def to_users(records: Iterator[dict]) -> Iterator[User]:
+    """ Yield a User for each record, hashing clear passwords
+    """
+    for record in records:
+        password = record.pop('password', None)
+        user = User(**record)
+        if password is not None:
+            user.password = password
+        yield user
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "export") or \
+            (sys.argv[1] == "import" and len(sys.argv) < 3):
+        sys.exit("Usage: {0} import <file> | {0} export [file]".format(
+            sys.argv[0]))
+    User.load_from_file()
+    file_path = sys.argv[2] if len(sys.argv) > 2 else "-"
+    if sys.argv[1] == "import":
+        is_csv = file_path.endswith(".csv")
+        if file_path == "-":
+            records = read_records(sys.stdin, is_csv)
+            count = User.import_objects(to_users(records))
+        else:
+            with open(file_path, newline='') as f:
+                records = read_records(f, is_csv)
+                count = User.import_objects(to_users(records))
+        print("{} users imported".format(count), file=sys.stderr)
+    elif file_path == "-":
+        User.export_jsonl(sys.stdout)
+    else:
+        with open(file_path, 'w') as f:
+            count = User.export_jsonl(f)
+        print("{} users exported".format(count), file=sys.stderr)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+""" Stand-in Redis server for development and tests
+Usage: ./mini_redis.py [port]   (6379 by default)
+Speaks enough of the Redis protocol for RedisSessionStore: PING, SELECT,
+GET, SET (with EX/PX), DEL, EXISTS, DBSIZE and FLUSHDB, in memory. Keys
+expire lazily when read and through a sweep every second.
+"""
+import asyncio
+import sys
+import time
+
+
+class MiniRedis:
+    """ Keys of the databases of the server
+    """
+
+    def __init__(self):
+        """ Initialize the databases: {db: {key: (value, expires_at)}}
+        """
+        self.databases = {}
+
+    def database(self, db: int) -> dict:
+        """ Keys of the database db
+        """
+        return self.databases.setdefault(db, {})
+
+    def lookup(self, keys: dict, key: bytes):
+        """ Value of a live key, None if there is none
+        """
+        entry = keys.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del keys[key]
+            return None
+        return entry[0]
+
+    def sweep(self):
+        """ Remove the expired keys
+        """
+        now = time.monotonic()
+        for keys in self.databases.values():
+            for key in [key for key, (_, expires_at) in keys.items()
+                        if expires_at is not None and expires_at <= now]:
+                del keys[key]
+
+    def execute(self, state: dict, args: list) -> bytes:
+        """ Reply of the command args of a client
+        """
+        name = args[0].upper()
+        keys = self.database(state['db'])
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name == b"SELECT" and len(args) == 2:
+            state['db'] = int(args[1])
+            return b"+OK\r\n"
+        if name == b"GET" and len(args) == 2:
+            value = self.lookup(keys, args[1])
+            if value is None:
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == b"SET" and len(args) in (3, 5):
+            expires_at = None
+            if len(args) == 5:
+                unit = {b"EX": 1, b"PX": 0.001}.get(args[3].upper())
+                if unit is None:
+                    return b"-ERR syntax error\r\n"
+                expires_at = time.monotonic() + int(args[4]) * unit
+            keys[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if name in (b"DEL", b"EXISTS") and len(args) > 1:
+            found = [key for key in args[1:]
+                     if self.lookup(keys, key) is not None]
+            if name == b"DEL":
+                for key in found:
+                    del keys[key]
+            return b":%d\r\n" % len(found)
+        if name == b"DBSIZE":
+            return b":%d\r\n" % len(keys)
+        if name == b"FLUSHDB":
+            keys.clear()
+            return b"+OK\r\n"
+        return b"-ERR unknown command or wrong number of arguments\r\n"
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        """ Serve the commands of one client
+        """
+        state = {'db': 0}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.startswith(b"*"):
+                    break
+                args = []
+                for _ in range(int(line[1:])):
+                    size = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                writer.write(self.execute(state, args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        writer.close()
+
+    async def serve(self, host: str, port: int):
+        """ Serve clients on host:port until cancelled
+        """
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            while True:
+                await asyncio.sleep(1)
+                self.sweep()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+    try:
+        asyncio.run(MiniRedis().serve("127.0.0.1", port))
+    except KeyboardInterrupt:
+        pass
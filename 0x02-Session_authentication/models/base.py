@@ -1,37 +1,186 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from typing import IO, TypeVar, List, Iterable, Iterator, Union
+from os import path, getenv
+from threading import Event, Lock, Thread
 import json
+import os
+import time
 import uuid
+from models.journal import Journal
+from models.mmap_store import MmapStore
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+# sorted IDs of each class for page(), None until first needed
+ORDERS = {}
+# guards INDEXES and ORDERS against concurrent saves (threaded server)
+INDEX_LOCK = Lock()
+# class -> names of its slots, see Base._slot_names()
+SLOT_NAMES = {}
+# "json": rewrite .db_<Class>.json on every change (default)
+# "journal": append changes to .db_<Class>.log, compact into the .json
+# "mmap": objects in the mapped .db_<Class>.rec, indexed by .db_<Class>.*.idx
+STORAGE = getenv('MODELS_STORAGE', 'json')
+try:
+    JOURNAL_MIN_COMPACT = int(getenv('MODELS_JOURNAL_MIN_COMPACT'))
+except Exception:
+    JOURNAL_MIN_COMPACT = 1000
+JOURNAL_SIZES = {}
+# (snapshot file signature, journal offset) as of the last (re)load
+FILE_STATES = {}
+# "eager": load_models() loads the classes before the app serves (default)
+# "lazy": a class is loaded on the first access to its objects
+# "background": load_models() loads the classes in a thread, accesses to
+# their objects wait for it
+LOAD_MODE = getenv('MODELS_LOAD', 'eager')
+# class name -> Event set once its objects are loaded (see Base._store())
+LOADED = {}
+LOAD_LOCK = Lock()
+# class name -> seconds taken by its last load_from_file()
+LOAD_TIMES = {}
+
+
+def _format_timestamp(value: datetime) -> str:
+    """ Format a datetime with TIMESTAMP_FORMAT
+    """
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string
+    """
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def _format_timestamp_fast(value: datetime) -> str:
+    """ _format_timestamp through isoformat(), several times faster
+    """
+    if value.tzinfo is not None or value.year < 1000:
+        # isoformat() adds the offset, or pads the year: not the same text
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value.isoformat(timespec='seconds')
+
+
+def _parse_timestamp_fast(value: str) -> datetime:
+    """ _parse_timestamp through fromisoformat(), several times faster
+    """
+    # fromisoformat() accepts more than TIMESTAMP_FORMAT (week dates,
+    # offsets...): only the exact YYYY-MM-DDTHH:MM:SS shape takes it
+    if len(value) == 19 and value[4] + value[7] + value[10] + value[13] + \
+            value[16] == '--T::':
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def _load_json(f) -> dict:
+    """ Load a JSON file
+    """
+    return json.load(f)
+
+
+def _load_json_fast(f) -> dict:
+    """ Load a JSON file with orjson if installed
+    """
+    if orjson is None:
+        return json.load(f)
+    return orjson.loads(f.read())
+
+
+# "default": strftime/strptime and json
+# "fast": isoformat/fromisoformat and orjson (if installed) to load files,
+# for the same output
+CODECS = {
+    'default': (_format_timestamp, _parse_timestamp, _load_json),
+    'fast': (_format_timestamp_fast, _parse_timestamp_fast, _load_json_fast),
+}
+format_timestamp, parse_timestamp, load_json = CODECS['default']
+
+
+def use_codec(name: str):
+    """ Select the codec of the models (MODELS_CODEC)
+    """
+    global format_timestamp, parse_timestamp, load_json
+    format_timestamp, parse_timestamp, load_json = CODECS[name]
+
+
+use_codec(getenv('MODELS_CODEC', 'default'))
+
+
+def load_models(*classes: type):
+    """ Load the objects of classes as MODELS_LOAD says: now (eager), in a
+    thread (background) or on the first access to each class (lazy)
+    """
+    if LOAD_MODE == 'eager':
+        for cls in classes:
+            cls.load_from_file()
+    elif LOAD_MODE == 'background':
+        pending = []
+        with LOAD_LOCK:
+            for cls in classes:
+                if cls.__name__ not in LOADED:
+                    LOADED[cls.__name__] = Event()
+                    pending.append((cls, LOADED[cls.__name__]))
+
+        def warm_up():
+            """ Load the pending classes
+            """
+            for cls, loaded in pending:
+                try:
+                    cls._load(loaded)
+                except Exception:
+                    # retracted: the next access loads it (and fails) again
+                    continue
+
+        Thread(target=warm_up, name="models-warm-up", daemon=True).start()
+
+
+def load_metrics() -> dict:
+    """ MODELS_LOAD mode, seconds taken by the last load of each class, and
+    classes still loading
+    """
+    with LOAD_LOCK:
+        loading = sorted(name for name, loaded in LOADED.items()
+                         if not loaded.is_set())
+    return {'mode': LOAD_MODE, 'seconds': dict(LOAD_TIMES),
+            'loading': loading}
 
 
 class Base():
     """ Base class
     """
 
+    # attributes live in slots, not in a per-instance __dict__: subclasses
+    # declare theirs the same way (an undeclared one gets a __dict__ back)
+    __slots__ = ('id', 'created_at', 'updated_at')
+
+    # attributes kept in a hash index (value -> ids) for fast search(); the
+    # index is updated by save() and remove() only, see search()
+    indexed_attributes = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
-        if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+        if kwargs.get('updated_at') is not None and \
+                kwargs.get('updated_at') == kwargs.get('created_at'):
+            # datetimes are immutable: one can serve both attributes
+            self.updated_at = self.created_at
+        elif kwargs.get('updated_at') is not None:
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -47,66 +196,281 @@ class Base():
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
-        result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
+        return {
+            key: format_timestamp(value) if type(value) is datetime else value
+            for key, value in self._attributes()
+            if for_serialization or key[0] != '_'
+        }
+
+    def _attributes(self) -> Iterator[tuple]:
+        """ Iterate over the (name, value) of the attributes of the object,
+        in the order of assignment by __init__
+        """
+        for key in self.__class__._slot_names():
+            try:
+                yield key, getattr(self, key)
+            except AttributeError:
                 continue
-            if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
-            else:
-                result[key] = value
-        return result
+        if hasattr(self, '__dict__'):
+            yield from self.__dict__.items()
+
+    @classmethod
+    def _slot_names(cls) -> tuple:
+        """ Names of the slots of the class and its parents, parents first
+        """
+        names = SLOT_NAMES.get(cls)
+        if names is None:
+            names = tuple(
+                name for klass in reversed(cls.__mro__)
+                for name in klass.__dict__.get('__slots__', ())
+                if name not in ('__dict__', '__weakref__')
+            )
+            SLOT_NAMES[cls] = names
+        return names
 
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
         """
+        start = time.perf_counter()
         s_class = cls.__name__
+        if STORAGE == 'mmap':
+            # only the headers are read: objects are read when accessed
+            cls._reset_indexes()
+            DATA[s_class] = MmapStore(cls, ".db_{}".format(s_class))
+            cls._loaded(start)
+            return
         file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        objs = DATA[s_class] = {}
+        cls._reset_indexes()
+        signature = None
+        if path.exists(file_path):
+            with open(file_path, 'r') as f:
+                signature = cls._file_signature(os.fstat(f.fileno()))
+                objs_json = load_json(f)
+                for obj_id, obj_json in objs_json.items():
+                    obj = cls(**obj_json)
+                    objs[obj_id] = obj
+                    cls._index_add(obj)
+
+        entries, offset = cls._journal().read()
+        cls._apply_journal(entries)
+        JOURNAL_SIZES[s_class] = len(entries)
+        FILE_STATES[s_class] = (signature, offset)
+        cls._loaded(start)
+
+    @classmethod
+    def _loaded(cls, start: float):
+        """ Record the end of a load started at start (perf_counter())
+        """
+        LOAD_TIMES[cls.__name__] = time.perf_counter() - start
+        with LOAD_LOCK:
+            LOADED.setdefault(cls.__name__, Event()).set()
+
+    @classmethod
+    def _store(cls) -> dict:
+        """ Objects of the class by ID, loaded first as MODELS_LOAD says
+        """
+        loaded = LOADED.get(cls.__name__)
+        if loaded is None or not loaded.is_set():
+            cls._wait_loaded()
+        return DATA[cls.__name__]
+
+    @classmethod
+    def _wait_loaded(cls):
+        """ Wait for the objects of the class to be loaded, by this thread
+        if no other thread is loading them
+        """
+        s_class = cls.__name__
+        while True:
+            with LOAD_LOCK:
+                loaded = LOADED.get(s_class)
+                loading = loaded is None
+                if loading:
+                    loaded = LOADED[s_class] = Event()
+            if loading:
+                cls._load(loaded)
+            loaded.wait()
+            if LOADED.get(s_class) is loaded:
+                return
+            # the load by another thread failed: try again
+
+    @classmethod
+    def _load(cls, loaded: Event):
+        """ Load the objects of the class, then set loaded
+        A class never given to load_models() starts empty in eager mode
+        (except with the mmap storage, whose files are only opened).
+        """
+        s_class = cls.__name__
+        try:
+            if LOAD_MODE == 'eager' and STORAGE != 'mmap':
+                DATA[s_class] = {}
+                cls._reset_indexes()
+                loaded.set()
+            else:
+                cls.load_from_file()
+        except BaseException:
+            with LOAD_LOCK:
+                if LOADED.get(s_class) is loaded:
+                    del LOADED[s_class]
+            loaded.set()
+            raise
+
+    @classmethod
+    def refresh_from_file(cls):
+        """ Reload objects only if the files changed since the last load:
+        a new snapshot is fully reloaded, new journal entries are replayed
+        """
+        s_class = cls.__name__
+        if STORAGE == 'mmap':
+            # changes are in the mapped files already: remap the files
+            # replaced (or grown) by another process
+            if isinstance(DATA.get(s_class), MmapStore):
+                DATA[s_class].refresh()
+            else:
+                cls.load_from_file()
+            return
+        file_path = ".db_{}.json".format(s_class)
+        state = FILE_STATES.get(s_class)
+        signature = None
+        if path.exists(file_path):
+            signature = cls._file_signature(os.stat(file_path))
+        journal = cls._journal()
+        if state is None or state[0] != signature or \
+                journal.size() < state[1]:
+            cls.load_from_file()
             return
+        entries, offset = journal.read(state[1])
+        cls._apply_journal(entries)
+        JOURNAL_SIZES[s_class] = JOURNAL_SIZES.get(s_class, 0) + len(entries)
+        FILE_STATES[s_class] = (signature, offset)
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @staticmethod
+    def _file_signature(stat: os.stat_result) -> tuple:
+        """ Identify a version of a file: replaced or rewritten files differ
+        """
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
         s_class = cls.__name__
+        if STORAGE == 'mmap':
+            # objects are written in place: only flush them to disk
+            cls._store().flush()
+            return
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        # write aside then rename, so a crash never leaves a partial file
+        tmp_path = "{}.tmp".format(file_path)
+        with open(tmp_path, 'w') as f:
+            # same output as json.dump() of {id: to_json(True)}, written
+            # one object at a time
+            f.write("{")
+            separator = ""
+            for obj_id, obj in cls._store().items():
+                f.write("{}{}: {}".format(separator, json.dumps(obj_id),
+                                          json.dumps(obj.to_json(True))))
+                separator = ", "
+            f.write("}")
+        os.replace(tmp_path, file_path)
+        # the snapshot now contains every journaled change
+        cls._journal().clear()
+        JOURNAL_SIZES[s_class] = 0
+        FILE_STATES[s_class] = (cls._file_signature(os.stat(file_path)), 0)
+
+    @classmethod
+    def import_objects(cls, records: Iterable[Union[dict, 'Base']]) -> int:
+        """ Add objects (instances, or dicts as given by to_json(True)) and
+        persist them all at once, instead of once per object as save()
+        Objects must be loaded first: the file is rewritten from DATA
+        """
+        s_class = cls.__name__
+        objs = cls._store()
+        # sorted again once on the next page() instead of on every insert
+        with INDEX_LOCK:
+            ORDERS[s_class] = None
+        count = 0
+        for record in records:
+            obj = record if isinstance(record, cls) else cls(**record)
+            objs[obj.id] = obj
+            cls._index_add(obj)
+            count += 1
+        if count > 0:
+            cls.save_to_file()
+        return count
+
+    @classmethod
+    def export_jsonl(cls, stream: IO) -> int:
+        """ Write every object to stream as one to_json(True) JSON line
+        """
+        count = 0
+        for obj in cls._store().values():
+            stream.write(json.dumps(obj.to_json(True)))
+            stream.write("\n")
+            count += 1
+        return count
+
+    @classmethod
+    def _journal(cls) -> Journal:
+        """ Journal (write-ahead log) of the class
+        """
+        return Journal(".db_{}.log".format(cls.__name__))
+
+    @classmethod
+    def _apply_journal(cls, entries: list):
+        """ Replay journal entries on the loaded objects
+        """
+        objs = DATA[cls.__name__]
+        for obj_id, obj_json in entries:
+            if obj_json is None:
+                if objs.pop(obj_id, None) is not None:
+                    cls._index_remove(obj_id)
+            else:
+                obj = cls(**obj_json)
+                objs[obj_id] = obj
+                cls._index_add(obj)
+
+    @classmethod
+    def _persist(cls, obj_id: str, obj_json: dict = None):
+        """ Persist the change of one object (obj_json None for a removal)
+        """
+        if STORAGE == 'mmap':
+            # already written in place by the store
+            return
+        if STORAGE != 'journal':
+            cls.save_to_file()
+            return
+        s_class = cls.__name__
+        cls._journal().append(obj_id, obj_json)
+        JOURNAL_SIZES[s_class] = JOURNAL_SIZES.get(s_class, 0) + 1
+        # compact once the log outgrows the data: amortized O(1) per write
+        if JOURNAL_SIZES[s_class] >= max(JOURNAL_MIN_COMPACT,
+                                         len(DATA[s_class])):
+            cls.save_to_file()
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__._store()[self.id] = self
+        self.__class__._index_add(self)
+        self.__class__._persist(self.id, self.to_json(True))
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        # one pop(): another worker may remove the object meanwhile
+        if self.__class__._store().pop(self.id, None) is not None:
+            self.__class__._index_remove(self.id)
+            self.__class__._persist(self.id)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return len(cls._store())
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,14 +482,15 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls._store().get(id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+        A search on an indexed attribute sees its values as of the last
+        save() of each object: an object whose indexed attribute was
+        changed and not saved yet is found by its saved value only.
         """
-        s_class = cls.__name__
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +498,130 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        candidates = cls._index_candidates(attributes)
+        if candidates is None:
+            candidates = cls._store().values()
+        return list(filter(_search, candidates))
+
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return objects sorted by ID: at most limit of them, starting
+        after the ID after (the last ID of the previous page)
+        """
+        objs = cls._store()
+        with INDEX_LOCK:
+            ids = cls._ordered_ids()
+            start = 0 if after is None else bisect_right(ids, after)
+            end = len(ids) if limit is None else start + limit
+            ids = ids[start:end]
+        return [objs[obj_id] for obj_id in ids if obj_id in objs]
+
+    @classmethod
+    def iter_ordered(cls, after: str = None,
+                     chunk: int = 1000) -> Iterator[TypeVar('Base')]:
+        """ Iterate over objects sorted by ID, starting after the ID after,
+        one page() of chunk objects at a time
+        """
+        while True:
+            objs = cls.page(after, chunk)
+            yield from objs
+            if len(objs) < chunk:
+                return
+            after = objs[-1].id
+
+    @classmethod
+    def _ordered_ids(cls) -> List[str]:
+        """ Sorted IDs of the class, sorted once and then kept in order
+        The caller holds INDEX_LOCK and has loaded the class.
+        """
+        s_class = cls.__name__
+        if ORDERS.get(s_class) is None:
+            ORDERS[s_class] = sorted(DATA[s_class])
+        return ORDERS[s_class]
+
+    @classmethod
+    def _reset_indexes(cls):
+        """ Drop and recreate the (empty) indexes of the class
+        """
+        # the mmap store keeps its own indexes, on disk
+        attributes = () if STORAGE == 'mmap' else cls.indexed_attributes
+        with INDEX_LOCK:
+            INDEXES[cls.__name__] = {attr: ({}, {}) for attr in attributes}
+            ORDERS[cls.__name__] = None
+
+    @classmethod
+    def _index_add(cls, obj: TypeVar('Base')):
+        """ Index (or re-index) an object on every indexed attribute
+        """
+        with INDEX_LOCK:
+            order = ORDERS.get(cls.__name__)
+            if order is not None:
+                i = bisect_left(order, obj.id)
+                if i == len(order) or order[i] != obj.id:
+                    order.insert(i, obj.id)
+            for attr, (by_value, by_id) in INDEXES[cls.__name__].items():
+                value = getattr(obj, attr, None)
+                if obj.id in by_id:
+                    if by_id[obj.id] == value:
+                        continue
+                    cls._index_discard(by_value, by_id.pop(obj.id), obj.id)
+                try:
+                    by_value.setdefault(value, {})[obj.id] = None
+                except TypeError:
+                    # unhashable values are never indexed: search() falls
+                    # back to a scan
+                    continue
+                by_id[obj.id] = value
+
+    @classmethod
+    def _index_remove(cls, obj_id: str):
+        """ Remove an object ID from every index
+        """
+        with INDEX_LOCK:
+            order = ORDERS.get(cls.__name__)
+            if order is not None:
+                i = bisect_left(order, obj_id)
+                if i < len(order) and order[i] == obj_id:
+                    del order[i]
+            for by_value, by_id in INDEXES[cls.__name__].values():
+                if obj_id in by_id:
+                    cls._index_discard(by_value, by_id.pop(obj_id), obj_id)
+
+    @staticmethod
+    def _index_discard(by_value: dict, value, obj_id: str):
+        """ Remove one (value, ID) entry from an index
+        """
+        ids = by_value.get(value)
+        if ids is not None:
+            ids.pop(obj_id, None)
+            if len(ids) == 0:
+                del by_value[value]
+
+    @classmethod
+    def _index_candidates(cls, attributes: dict):
+        """ Return the smallest set of indexed objects that can match
+        attributes, or None when no index applies
+        """
+        # loaded first: the indexes are built by the load
+        store = cls._store()
+        if STORAGE == 'mmap':
+            return store.candidates(attributes)
+        indexes = INDEXES.get(cls.__name__, {})
+        best = None
+        with INDEX_LOCK:
+            for k, v in attributes.items():
+                if k not in indexes:
+                    continue
+                try:
+                    objs = indexes[k][0].get(v, {})
+                except TypeError:
+                    continue
+                if best is None or len(objs) < len(best):
+                    best = objs
+            if best is None:
+                return None
+            # copied: saves of other threads change the index
+            best = list(best)
+        return [store[obj_id] for obj_id in best if obj_id in store]
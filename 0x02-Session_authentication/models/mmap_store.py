@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+""" Mmap store module: objects in memory-mapped files of fixed-size slots,
+found through memory-mapped hash indexes
+Files of a class, for a prefix such as .db_User:
+  - <prefix>.rec: a header, then one slot per object: state, length and
+    JSON of the object, padded to the slot size; the JSON of an object
+    too large for its slot is in <prefix>.heap, the slot keeps its offset
+  - <prefix>.<attribute>.idx: open addressing hash table of (hash of the
+    value, slot) for id and each indexed attribute of the class
+Opening a store reads nothing else than the headers: a lookup only loads
+the pages of the buckets and slots it reads.
+Processes share the files: operations hold a lock on <prefix>.rec
+(shared to read, exclusive to write) and see the changes of the others.
+"""
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Tuple, Union
+from os import path
+from threading import RLock
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+# magic, slot size, slots allocated, slots used, live objects, first
+# free slot (-1: none), version of the index and heap files (changes when
+# one is replaced), bytes of live JSON in the heap
+REC_HEADER = struct.Struct("<8sIIIIiIQ")
+REC_MAGIC = b"MMREC002"
+REC_DATA = 64
+# state, then length of the JSON (live, heap) or next free slot (free);
+# a heap slot then holds the offset of the JSON in the heap file
+SLOT_HEADER = struct.Struct("<Bi")
+HEAP_OFFSET = struct.Struct("<Q")
+FREE = 0
+LIVE = 1
+HEAP = 2
+MIN_SLOTS = 64
+MIN_SLOT_SIZE = 128
+MAX_SLOT_SIZE = 1024
+DEFAULT_SLOT_SIZE = 512
+# the heap is compacted once it is larger than this and twice its live data
+HEAP_MIN_COMPACT = 1 << 20
+# magic, buckets (a power of 2), filled buckets (live and deleted), live
+IDX_HEADER = struct.Struct("<8sIII")
+IDX_MAGIC = b"MMIDX001"
+IDX_DATA = 32
+# hash of the value, slot + 1 (EMPTY: never used, DELETED: removed)
+BUCKET = struct.Struct("<QI")
+EMPTY = 0
+DELETED = 0xFFFFFFFF
+MIN_BUCKETS = 64
+
+
+def value_hash(value) -> int:
+    """ 64-bit hash of a JSON value, the same in every process
+    Raise TypeError if value is not JSON serializable
+    """
+    data = json.dumps(value).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(),
+                          'little')
+
+
+def _map_file(file_path: str) -> mmap.mmap:
+    """ Map a whole file for reading and writing
+    """
+    with open(file_path, 'r+b') as f:
+        return mmap.mmap(f.fileno(), 0)
+
+
+def _replace_file(file_path: str, data: Union[bytes, bytearray]):
+    """ Write a file aside then rename it, so a crash never leaves a
+    partial file
+    """
+    tmp_path = "{}.tmp".format(file_path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
+
+
+class HashIndex():
+    """ Open addressing (linear probing) hash table in a mapped file,
+    from values to the slots of the objects holding them
+    Values share buckets on hash collisions: the caller checks the value
+    of the object in each slot found.
+    """
+
+    def __init__(self, file_path: str):
+        """ Open (or create) the index file_path
+        """
+        self.file_path = file_path
+        if not path.exists(file_path):
+            HashIndex.create(file_path, [])
+        self.map = _map_file(file_path)
+        self._read_header()
+
+    @staticmethod
+    def create(file_path: str, entries: List[Tuple[int, int]],
+               buckets: int = MIN_BUCKETS):
+        """ Write an index of entries (hash, slot), at most half full
+        """
+        while len(entries) * 2 > buckets:
+            buckets *= 2
+        data = bytearray(IDX_DATA + buckets * BUCKET.size)
+        mask = buckets - 1
+        for value_h, slot in entries:
+            i = value_h & mask
+            while BUCKET.unpack_from(data, IDX_DATA + i * BUCKET.size)[1]:
+                i = (i + 1) & mask
+            BUCKET.pack_into(data, IDX_DATA + i * BUCKET.size,
+                             value_h, slot + 1)
+        IDX_HEADER.pack_into(data, 0, IDX_MAGIC, buckets, len(entries),
+                             len(entries))
+        _replace_file(file_path, data)
+
+    def _read_header(self):
+        """ Read the header (another process may have written it)
+        """
+        magic, self.buckets, self.filled, self.live = \
+            IDX_HEADER.unpack_from(self.map, 0)
+        if magic != IDX_MAGIC:
+            raise ValueError("{} is not an index".format(self.file_path))
+
+    def _write_header(self):
+        """ Write the header
+        """
+        IDX_HEADER.pack_into(self.map, 0, IDX_MAGIC, self.buckets,
+                             self.filled, self.live)
+
+    def slots(self, value) -> List[int]:
+        """ Slots of the objects whose value may be value
+        """
+        self._read_header()
+        value_h = value_hash(value)
+        mask = self.buckets - 1
+        i = value_h & mask
+        found = []
+        while True:
+            bucket_h, slot = BUCKET.unpack_from(self.map,
+                                                IDX_DATA + i * BUCKET.size)
+            if slot == EMPTY:
+                return found
+            if slot != DELETED and bucket_h == value_h:
+                found.append(slot - 1)
+            i = (i + 1) & mask
+
+    def add(self, value, slot: int) -> bool:
+        """ Add the object in slot, holding value
+        Return:
+          - True if the index file was replaced by a larger one
+        """
+        self._read_header()
+        # at most 3/4 full counting deleted buckets, so probes end fast
+        rebuilt = (self.filled + 1) * 4 > self.buckets * 3
+        if rebuilt:
+            self._rebuild()
+        value_h = value_hash(value)
+        mask = self.buckets - 1
+        i = value_h & mask
+        while True:
+            offset = IDX_DATA + i * BUCKET.size
+            previous = BUCKET.unpack_from(self.map, offset)[1]
+            if previous in (EMPTY, DELETED):
+                break
+            i = (i + 1) & mask
+        BUCKET.pack_into(self.map, offset, value_h, slot + 1)
+        if previous == EMPTY:
+            self.filled += 1
+        self.live += 1
+        self._write_header()
+        return rebuilt
+
+    def remove(self, value, slot: int):
+        """ Remove the object in slot, holding value
+        """
+        self._read_header()
+        value_h = value_hash(value)
+        mask = self.buckets - 1
+        i = value_h & mask
+        while True:
+            offset = IDX_DATA + i * BUCKET.size
+            bucket_h, bucket_slot = BUCKET.unpack_from(self.map, offset)
+            if bucket_slot == EMPTY:
+                return
+            if bucket_h == value_h and bucket_slot == slot + 1:
+                break
+            i = (i + 1) & mask
+        BUCKET.pack_into(self.map, offset, 0, DELETED)
+        self.live -= 1
+        self._write_header()
+
+    def _rebuild(self):
+        """ Rewrite the index without its deleted buckets, twice as large
+        as its live entries: O(1) amortized per add()
+        """
+        entries = []
+        for i in range(self.buckets):
+            value_h, slot = BUCKET.unpack_from(self.map,
+                                               IDX_DATA + i * BUCKET.size)
+            if slot not in (EMPTY, DELETED):
+                entries.append((value_h, slot - 1))
+        self.map.close()
+        HashIndex.create(self.file_path, entries, MIN_BUCKETS)
+        self.map = _map_file(self.file_path)
+        self._read_header()
+
+    def flush(self):
+        """ Write the changes of the index to disk
+        """
+        self.map.flush()
+
+    def close(self):
+        """ Unmap the index
+        """
+        self.map.close()
+
+
+def _slot_size(lengths: List[int]) -> int:
+    """ Slot size holding JSON of 99% of lengths (the others go to the
+    heap), between MIN_SLOT_SIZE and MAX_SLOT_SIZE
+    """
+    if not lengths:
+        return DEFAULT_SLOT_SIZE
+    typical = sorted(lengths)[int(len(lengths) * 0.99)]
+    slot_size = MIN_SLOT_SIZE
+    while slot_size < MAX_SLOT_SIZE and \
+            SLOT_HEADER.size + typical > slot_size:
+        slot_size *= 2
+    return slot_size
+
+
+def _pwrite(fd: int, data: bytes, offset: int):
+    """ Write all of data at offset of the file fd
+    """
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+class MmapStore():
+    """ Objects of a class in a memory-mapped record file, with a hash
+    index on id and on each indexed attribute of the class
+    Works as the dict of objects by ID of the class (see Base._store()):
+    objects are decoded from their slot on each access. Changes are
+    written in place, under an exclusive lock of the record file: the
+    processes mapping the files see them at their next operation.
+    """
+
+    def __init__(self, cls: type, prefix: str):
+        """ Open (or create) the files prefix.* of the objects of cls
+        """
+        self.cls = cls
+        self.prefix = prefix
+        self.attributes = ('id',) + tuple(cls.indexed_attributes)
+        if not path.exists(self.record_path):
+            MmapStore.build(cls, prefix, [])
+        self.file = None
+        self._open()
+        self.refresh()
+
+    def _open(self):
+        """ Open the record file and map it, for this process: a process
+        forked from one that had the store open must not share its file,
+        or the lock of the file would not keep them apart (the indexes
+        and heap are opened by the next _sync())
+        """
+        if self.file is not None:
+            # inherited through fork(): closing them leaves the parent's
+            # files, and its lock, as they are
+            self.close()
+        # the record file is never replaced, only grown: its lock and
+        # header coordinate the processes
+        self.file = open(self.record_path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.indexes = {}
+        self.heap_fd = None
+        self.mapped_version = None
+        # a lock inherited through fork() may have been held by a thread
+        # of the parent, which does not exist here
+        self.lock = RLock()
+        self._depth = 0
+        self.pid = os.getpid()
+
+    @property
+    def record_path(self) -> str:
+        """ Path of the record file
+        """
+        return "{}.rec".format(self.prefix)
+
+    @property
+    def heap_path(self) -> str:
+        """ Path of the heap file
+        """
+        return "{}.heap".format(self.prefix)
+
+    def index_path(self, attr: str) -> str:
+        """ Path of the index file of attr
+        """
+        return "{}.{}.idx".format(self.prefix, attr)
+
+    @staticmethod
+    def build(cls: type, prefix: str, records: Iterable[dict]) -> int:
+        """ Write the files prefix.* of the objects records (as given by
+        to_json(True)) of cls, replacing existing ones
+        No process may have the store open meanwhile.
+        Return:
+          - the number of objects written
+        """
+        attributes = ('id',) + tuple(cls.indexed_attributes)
+        records = [(record, json.dumps(record).encode('utf-8'))
+                   for record in records]
+        slot_size = _slot_size([len(data) for _, data in records])
+        allocated = max(MIN_SLOTS, len(records))
+        data = bytearray(REC_DATA + allocated * slot_size)
+        heap = bytearray()
+        entries = {attr: [] for attr in attributes}
+        for slot, (record, record_data) in enumerate(records):
+            offset = REC_DATA + slot * slot_size
+            start = offset + SLOT_HEADER.size
+            if SLOT_HEADER.size + len(record_data) <= slot_size:
+                SLOT_HEADER.pack_into(data, offset, LIVE, len(record_data))
+                data[start:start + len(record_data)] = record_data
+            else:
+                SLOT_HEADER.pack_into(data, offset, HEAP, len(record_data))
+                HEAP_OFFSET.pack_into(data, start, len(heap))
+                heap += record_data
+            for attr in attributes:
+                entries[attr].append((value_hash(record.get(attr)), slot))
+        REC_HEADER.pack_into(data, 0, REC_MAGIC, slot_size, allocated,
+                             len(records), len(records), -1, 0, len(heap))
+        for attr in attributes:
+            HashIndex.create("{}.{}.idx".format(prefix, attr), entries[attr])
+        _replace_file("{}.heap".format(prefix), heap)
+        _replace_file("{}.rec".format(prefix), data)
+        return len(records)
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False):
+        """ Hold the lock of the store, exclusive to write and shared to
+        read; the outermost call locks the record file and catches up
+        with the changes of the other processes
+        """
+        if self.pid != os.getpid():
+            self._open()
+        with self.lock:
+            outer = self._depth == 0
+            if outer:
+                fcntl.flock(self.file.fileno(),
+                            fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._depth += 1
+            try:
+                if outer:
+                    self._sync()
+                yield
+            finally:
+                self._depth -= 1
+                if outer:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self):
+        """ Read the header, map again the record file if another process
+        grew it, and reopen the indexes and heap if one was replaced
+        """
+        self._read_header()
+        if REC_DATA + self.allocated * self.slot_size > len(self.map):
+            self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        if self.version != self.mapped_version:
+            for index in self.indexes.values():
+                index.close()
+            self.indexes = {attr: HashIndex(self.index_path(attr))
+                            for attr in self.attributes}
+            self._open_heap()
+            self.mapped_version = self.version
+
+    def _open_heap(self):
+        """ Open the heap file (again)
+        """
+        if self.heap_fd is not None:
+            os.close(self.heap_fd)
+        self.heap_fd = os.open(self.heap_path, os.O_RDWR | os.O_CREAT)
+
+    def refresh(self):
+        """ Catch up with the changes of the other processes (every
+        operation does it)
+        """
+        with self._locked():
+            pass
+
+    def _read_header(self):
+        """ Read the header
+        """
+        magic, self.slot_size, self.allocated, self.used, self.live, \
+            self.free, self.version, self.heap_live = \
+            REC_HEADER.unpack_from(self.map, 0)
+        if magic != REC_MAGIC:
+            raise ValueError("{} is not a record file".format(
+                self.record_path))
+
+    def _write_header(self):
+        """ Write the header
+        """
+        REC_HEADER.pack_into(self.map, 0, REC_MAGIC, self.slot_size,
+                             self.allocated, self.used, self.live, self.free,
+                             self.version, self.heap_live)
+
+    def _record(self, slot: int) -> Union[dict, None]:
+        """ JSON of the object in slot, None if the slot is free
+        """
+        offset = REC_DATA + slot * self.slot_size
+        state, length = SLOT_HEADER.unpack_from(self.map, offset)
+        start = offset + SLOT_HEADER.size
+        if state == LIVE:
+            return json.loads(self.map[start:start + length])
+        if state == HEAP:
+            heap_offset = HEAP_OFFSET.unpack_from(self.map, start)[0]
+            return json.loads(os.pread(self.heap_fd, length, heap_offset))
+        return None
+
+    def _find(self, obj_id: str) -> Tuple[Union[int, None], dict]:
+        """ Slot and JSON of the object obj_id, (None, None) if missing
+        """
+        for slot in self.indexes['id'].slots(obj_id):
+            record = self._record(slot)
+            if record is not None and record.get('id') == obj_id:
+                return slot, record
+        return None, None
+
+    def _records(self) -> Iterator[dict]:
+        """ JSON of every object, in slot order
+        """
+        for slot in range(self.used):
+            record = self._record(slot)
+            if record is not None:
+                yield record
+
+    def _allocate(self) -> int:
+        """ Take a free slot, growing the file if there is none
+        """
+        if self.free >= 0:
+            slot = self.free
+            self.free = SLOT_HEADER.unpack_from(
+                self.map, REC_DATA + slot * self.slot_size)[1]
+            return slot
+        if self.used == self.allocated:
+            self.allocated *= 2
+            self.map.close()
+            self.file.truncate(REC_DATA + self.allocated * self.slot_size)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        self.used += 1
+        return self.used - 1
+
+    def _write(self, slot: int, data: bytes):
+        """ Write the JSON data of an object in slot, or in the heap if it
+        is too large for the slot
+        """
+        offset = REC_DATA + slot * self.slot_size
+        start = offset + SLOT_HEADER.size
+        if SLOT_HEADER.size + len(data) <= self.slot_size:
+            self.map[start:start + len(data)] = data
+            SLOT_HEADER.pack_into(self.map, offset, LIVE, len(data))
+            return
+        heap_offset = os.lseek(self.heap_fd, 0, os.SEEK_END)
+        _pwrite(self.heap_fd, data, heap_offset)
+        HEAP_OFFSET.pack_into(self.map, start, heap_offset)
+        SLOT_HEADER.pack_into(self.map, offset, HEAP, len(data))
+        self.heap_live += len(data)
+
+    def _release(self, slot: int):
+        """ Account for the heap data of slot becoming garbage
+        """
+        state, length = SLOT_HEADER.unpack_from(
+            self.map, REC_DATA + slot * self.slot_size)
+        if state == HEAP:
+            self.heap_live -= length
+
+    def _compact_heap(self):
+        """ Rewrite the heap without its garbage once it is more than half
+        garbage: O(1) amortized per write
+        """
+        size = os.fstat(self.heap_fd).st_size
+        if size <= max(HEAP_MIN_COMPACT, 2 * self.heap_live):
+            return
+        heap = bytearray()
+        moves = []
+        for slot in range(self.used):
+            offset = REC_DATA + slot * self.slot_size
+            state, length = SLOT_HEADER.unpack_from(self.map, offset)
+            if state != HEAP:
+                continue
+            start = offset + SLOT_HEADER.size
+            heap_offset = HEAP_OFFSET.unpack_from(self.map, start)[0]
+            moves.append((start, len(heap)))
+            heap += os.pread(self.heap_fd, length, heap_offset)
+        _replace_file(self.heap_path, heap)
+        for start, heap_offset in moves:
+            HEAP_OFFSET.pack_into(self.map, start, heap_offset)
+        self._open_heap()
+        self._replaced()
+
+    def _replaced(self):
+        """ Tell the other processes that an index or the heap file was
+        replaced
+        """
+        self.version = (self.version + 1) & 0xFFFFFFFF
+        self.mapped_version = self.version
+
+    def get(self, obj_id: str, default=None):
+        """ Object obj_id, default if missing
+        """
+        with self._locked():
+            record = self._find(obj_id)[1]
+        if record is None:
+            return default
+        return self.cls(**record)
+
+    def __getitem__(self, obj_id: str):
+        """ Object obj_id, raise KeyError if missing
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            raise KeyError(obj_id)
+        return obj
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Whether the object obj_id exists
+        """
+        with self._locked():
+            return self._find(obj_id)[0] is not None
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        with self._locked():
+            return self.live
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over a snapshot of the IDs of the objects
+        """
+        with self._locked():
+            return iter([record['id'] for record in self._records()])
+
+    def keys(self) -> List[str]:
+        """ IDs of the objects
+        """
+        return list(self)
+
+    def values(self) -> list:
+        """ Every object
+        """
+        with self._locked():
+            records = list(self._records())
+        return [self.cls(**record) for record in records]
+
+    def items(self) -> List[tuple]:
+        """ (ID, object) of every object
+        """
+        return [(obj.id, obj) for obj in self.values()]
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Write (add or replace) the object obj_id
+        """
+        record = obj.to_json(True)
+        data = json.dumps(record).encode('utf-8')
+        with self._locked(exclusive=True):
+            slot, old = self._find(obj_id)
+            if slot is None:
+                slot = self._allocate()
+                self.live += 1
+            else:
+                self._release(slot)
+            self._write(slot, data)
+            replaced = False
+            for attr, index in self.indexes.items():
+                value = obj_id if attr == 'id' else record.get(attr)
+                if old is not None:
+                    if old.get(attr) == value:
+                        continue
+                    index.remove(old.get(attr), slot)
+                replaced = index.add(value, slot) or replaced
+            if replaced:
+                self._replaced()
+            self._compact_heap()
+            self._write_header()
+
+    def pop(self, obj_id: str, *default):
+        """ Remove the object obj_id and return it (or default if it is
+        missing)
+        """
+        with self._locked(exclusive=True):
+            slot, old = self._find(obj_id)
+            if slot is None:
+                if default:
+                    return default[0]
+                raise KeyError(obj_id)
+            self._release(slot)
+            SLOT_HEADER.pack_into(self.map, REC_DATA + slot * self.slot_size,
+                                  FREE, self.free)
+            self.free = slot
+            self.live -= 1
+            for attr, index in self.indexes.items():
+                index.remove(old.get(attr), slot)
+            self._write_header()
+        return self.cls(**old)
+
+    def __delitem__(self, obj_id: str):
+        """ Remove the object obj_id, raise KeyError if missing
+        """
+        self.pop(obj_id)
+
+    def candidates(self, attributes: dict) -> Union[list, None]:
+        """ Objects that can match attributes, found through the index of
+        one of them; None when no index applies
+        """
+        for attr, value in attributes.items():
+            if attr not in self.attributes:
+                continue
+            try:
+                with self._locked():
+                    records = [self._record(slot)
+                               for slot in self.indexes[attr].slots(value)]
+            except TypeError:
+                # not a JSON value: never indexed
+                continue
+            return [self.cls(**record) for record in records
+                    if record is not None and record.get(attr) == value]
+        return None
+
+    def flush(self):
+        """ Write the changes to disk
+        """
+        with self._locked():
+            self.map.flush()
+            for index in self.indexes.values():
+                index.flush()
+            os.fsync(self.heap_fd)
+
+    def close(self):
+        """ Unmap and close the files of this process
+        """
+        for index in self.indexes.values():
+            index.close()
+        if self.heap_fd is not None:
+            os.close(self.heap_fd)
+        self.map.close()
+        self.file.close()
@@ -3,12 +3,28 @@
 Basic Flask app
 """
 from flask import Flask, jsonify, request, abort, redirect
-from auth import Auth
+from auth import Auth, HashingPoolBusy
 
 AUTH = Auth()
 app = Flask(__name__)
 
 
+@app.teardown_appcontext
+def close_db_session(exception=None) -> None:
+    """
+    Release the database session of the request's thread
+    """
+    AUTH.close_db_session()
+
+
+@app.errorhandler(HashingPoolBusy)
+def hashing_pool_busy(error) -> str:
+    """
+    Too many password hashes in flight: ask the client to retry later
+    """
+    return jsonify({"message": "server busy"}), 503
+
+
 @app.route("/", strict_slashes=False)
 def index() -> str:
     """
@@ -102,4 +118,4 @@ def update_password() -> str:
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port="5000")
+    app.run(host="0.0.0.0", port="5000", threaded=True)
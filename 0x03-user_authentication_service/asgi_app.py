@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+ASGI variant of app.py, served by any ASGI server, e.g.:
+    uvicorn asgi_app:app --port 5000
+It needs aiosqlite for SQLite databases (pip3 install aiosqlite uvicorn).
+Same routes and responses as the Flask app, with database access on an
+async engine and bcrypt on the hashing pool, so that the event loop is
+never blocked and idle keep-alive connections cost no thread.
+"""
+import io
+import json
+import re
+from typing import Awaitable, Callable, Dict, List, Tuple, Union
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException, InternalServerError, \
+    MethodNotAllowed, NotFound, default_exceptions
+from werkzeug.formparser import FormDataParser
+from werkzeug.http import dump_cookie, parse_cookie, parse_options_header
+from werkzeug.utils import redirect as werkzeug_redirect
+import auth
+from async_auth import AsyncAuth
+from auth import HashingPoolBusy
+
+AUTH = AsyncAuth()
+
+
+class Request:
+    """
+    The parts of an HTTP request the routes use
+    """
+
+    def __init__(self, scope: dict, body: bytes) -> None:
+        """
+        Parse the cookies and the form of a request
+        """
+        headers = {}
+        for name, value in scope["headers"]:
+            headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+        self.method = scope["method"]
+        self.scheme = scope.get("scheme", "http")
+        self.host = headers.get("host", "localhost")
+        self.query_string = scope.get("query_string", b"").decode("latin-1")
+        self.cookies = parse_cookie(headers.get("cookie", ""))
+        self.form = MultiDict()
+        mimetype, options = parse_options_header(
+            headers.get("content-type", ""))
+        if body and mimetype:
+            _, self.form, _ = FormDataParser().parse(
+                io.BytesIO(body), mimetype, len(body), options)
+
+    def url(self, path: str) -> str:
+        """
+        Absolute URL of path on this host, with the query string of the
+        request
+        """
+        url = "{}://{}{}".format(self.scheme, self.host, path)
+        if self.query_string:
+            url += "?" + self.query_string
+        return url
+
+
+class Response:
+    """
+    Status, headers and body sent back to the client
+    """
+
+    def __init__(self, body: bytes, status: int = 200,
+                 headers: List[Tuple[str, str]] = None,
+                 content_type: str = "text/html; charset=utf-8") -> None:
+        """
+        Initialize a response
+        """
+        self.body = body
+        self.status = status
+        self.headers = [("Content-Type", content_type)] + (headers or [])
+
+    def set_cookie(self, key: str, value: str) -> None:
+        """
+        Set a cookie the way Flask's Response.set_cookie does
+        """
+        self.headers.append(("Set-Cookie", dump_cookie(key, value)))
+
+    async def send(self, send: Callable, head: bool = False) -> None:
+        """
+        Send the response through the ASGI send callable
+        """
+        headers = [(k.encode("latin-1"), v.encode("latin-1"))
+                   for k, v in self.headers]
+        headers.append((b"content-length", str(len(self.body)).encode()))
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": headers})
+        await send({"type": "http.response.body",
+                    "body": b"" if head else self.body})
+
+
+def jsonify(data: dict, status: int = 200) -> Response:
+    """
+    JSON response with the exact serialization of Flask's jsonify
+    """
+    body = json.dumps(data, sort_keys=True, separators=(",", ":")) + "\n"
+    return Response(body.encode(), status, content_type="application/json")
+
+
+def error(exception: HTTPException) -> Response:
+    """
+    Response of a werkzeug HTTP error, as Flask renders it
+    """
+    headers = [h for h in exception.get_headers() if h[0] != "Content-Type"]
+    return Response(exception.get_body().encode(), exception.code, headers)
+
+
+class Abort(Exception):
+    """Raised by abort() to stop a route with an HTTP error"""
+
+    def __init__(self, code: int) -> None:
+        self.code = code
+
+
+def abort(code: int) -> None:
+    """
+    Stop the route with the HTTP error code
+    """
+    raise Abort(code)
+
+
+def redirect(location: str, code: int = 302) -> Response:
+    """
+    Redirect response to location, as Flask's redirect builds it
+    """
+    resp = werkzeug_redirect(location, code)
+    headers = [(k, v) for k, v in resp.headers.items()
+               if k not in ("Content-Type", "Content-Length")]
+    return Response(resp.get_data(), resp.status_code, headers)
+
+
+Route = Callable[[Request], Awaitable[Response]]
+ROUTES: Dict[str, Dict[str, Route]] = {}
+
+
+def route(path: str, methods: List[str] = ["GET"]) -> Callable:
+    """
+    Register a coroutine handling path for methods
+    """
+    def decorator(handler: Route) -> Route:
+        for method in methods:
+            ROUTES.setdefault(path, {})[method] = handler
+        return handler
+    return decorator
+
+
+@route("/")
+async def index(request: Request) -> Response:
+    """
+    handles get request to '/' route
+    """
+    return jsonify({"message": "Bienvenue"})
+
+
+@route("/users", methods=["POST"])
+async def users(request: Request) -> Response:
+    """
+    handles post request to '/users' route to register new users
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+    try:
+        await AUTH.register_user(email, password)
+    except ValueError:
+        return jsonify({"message": "email already registered"}, 400)
+    return jsonify({"email": email, "message": "user created"})
+
+
+@route("/sessions", methods=["POST"])
+async def login(request: Request) -> Response:
+    """
+    Handles post request to '/sessions' route to login
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if await AUTH.valid_login(email, password):
+        session_id = await AUTH.create_session(email)
+        resp = jsonify({"email": email, "message": "logged in"})
+        resp.set_cookie("session_id", session_id)
+        return resp
+    abort(401)
+
+
+@route("/sessions", methods=["DELETE"])
+async def logout(request: Request) -> Response:
+    """
+    Handles delete request to '/sessions' route to logout
+    """
+    session_id = request.cookies.get("session_id", None)
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user:
+        await AUTH.destroy_session(user.id)
+        return redirect("/")
+    abort(403)
+
+
+@route("/profile")
+async def profile(request: Request) -> Response:
+    """
+    Return a user's email based on session_id in the received cookies
+    """
+    session_id = request.cookies.get("session_id", None)
+    if not session_id:
+        abort(403)
+    user = await AUTH.get_user_from_session_id(session_id)
+    if not user:
+        abort(403)
+    return jsonify({"email": user.email})
+
+
+@route("/reset_password", methods=["POST"])
+async def get_reset_password_token(request: Request) -> Response:
+    """
+    Generate a token for resetting a user's password
+    """
+    email = request.form.get("email")
+    try:
+        reset_token = await AUTH.get_reset_password_token(email)
+    except ValueError:
+        abort(403)
+    return jsonify({"email": email, "reset_token": reset_token})
+
+
+@route("/reset_password", methods=["PUT"])
+async def update_password(request: Request) -> Response:
+    """
+    Update a user's password
+    """
+    email = request.form.get("email")
+    reset_token = request.form.get("reset_token")
+    new_password = request.form.get("new_password")
+    try:
+        await AUTH.update_password(reset_token, new_password)
+    except ValueError:
+        abort(403)
+    return jsonify({"email": email, "message": "Password updated"})
+
+
+def find_route(path: str) -> Union[Dict[str, Route], None]:
+    """
+    Handlers of path by method, None if no route matches it
+    Every route is declared with strict_slashes=False in app.py: it also
+    matches its path followed by one slash.
+    """
+    handlers = ROUTES.get(path)
+    if handlers is None and path.endswith("/"):
+        handlers = ROUTES.get(path[:-1])
+    return handlers
+
+
+async def dispatch(request: Request, path: str) -> Response:
+    """
+    Run the route of a request, with Flask's routing and error handling
+    """
+    handlers = find_route(path)
+    if handlers is None:
+        # like werkzeug (merge_slashes), redirect to the path without
+        # repeated slashes when that one has a route
+        merged = re.sub("/{2,}", "/", path)
+        if merged != path and find_route(merged) is not None:
+            return redirect(request.url(merged), 308)
+        return error(NotFound())
+    allowed = set(handlers) | {"OPTIONS"}
+    if "GET" in handlers:
+        allowed.add("HEAD")
+    method = "GET" if request.method == "HEAD" else request.method
+    if request.method == "OPTIONS":
+        return Response(b"", headers=[("Allow", ", ".join(sorted(allowed)))])
+    if method not in handlers:
+        return error(MethodNotAllowed(sorted(allowed)))
+    try:
+        return await handlers[method](request)
+    except Abort as e:
+        return error(default_exceptions[e.code]())
+    except HashingPoolBusy:
+        return jsonify({"message": "server busy"}, 503)
+    except Exception:
+        return error(InternalServerError())
+
+
+async def read_body(receive: Callable) -> bytes:
+    """
+    Read the whole body of a request
+    """
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+async def lifespan(receive: Callable, send: Callable) -> None:
+    """
+    Prepare the database at startup; at shutdown, close it and stop the
+    hashing threads, so that no thread outlives the application
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await AUTH.init_db()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await AUTH.close_db()
+            auth.HASHING_POOL.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: dict, receive: Callable, send: Callable) -> None:
+    """
+    ASGI application
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    request = Request(scope, await read_body(receive))
+    response = await dispatch(request, scope["path"])
+    await response.send(send, head=scope["method"] == "HEAD")
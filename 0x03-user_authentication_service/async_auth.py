@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+async_auth module: asyncio counterpart of auth.Auth
+"""
+import asyncio
+import bcrypt
+from sqlalchemy.orm.exc import NoResultFound
+from typing import Union
+import auth
+from auth import SessionCache, _generate_uuid
+from db import _int_env
+from async_db import AsyncDB
+from user import User
+
+
+async def _hash_password(password: str) -> bytes:
+    """
+    Hashes a password string on the hashing pool without blocking the
+    event loop
+    Args:
+        password (str): password in string format
+    """
+    pool = auth.HASHING_POOL
+    return await asyncio.wrap_future(pool.submit(
+        bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(pool.rounds)))
+
+
+async def _check_password(password: str, hashed_password: bytes) -> bool:
+    """
+    Checks a password against its hash on the hashing pool
+    """
+    return await asyncio.wrap_future(auth.HASHING_POOL.submit(
+        bcrypt.checkpw, password.encode('utf-8'), hashed_password))
+
+
+class AsyncAuth:
+    """AsyncAuth class to interact with the authentication database,
+    with the same behaviour as Auth
+    """
+
+    def __init__(self, database_url: str = None):
+        self._db = AsyncDB(database_url)
+        self.session_cache = SessionCache(
+            _int_env("AUTH_SESSION_CACHE_SIZE", 4096),
+            # a logout or password reset done by another worker process is
+            # seen here only once the entry expires: at most TTL seconds
+            _int_env("AUTH_SESSION_CACHE_TTL", 5),
+        )
+
+    async def init_db(self) -> None:
+        """
+        Prepare the database schema (at application startup)
+        """
+        await self._db.init_schema()
+
+    async def close_db(self) -> None:
+        """
+        Close the database connections (at application shutdown)
+        """
+        await self._db.close()
+
+    async def register_user(self, email: str, password: str) -> User:
+        """
+        Register a new user and return a user object, see Auth
+        """
+        try:
+            await self._db.find_user_by(email=email)
+        except NoResultFound:
+            password = await _hash_password(password)
+            return await self._db.add_user(email, password)
+        raise ValueError(f'User {email} already exists')
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """
+        Validate a user's login credentials, see Auth
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return False
+        return await _check_password(password, user.hashed_password)
+
+    async def create_session(self, email: str) -> Union[str, None]:
+        """
+        Create a session_id for an existing user, see Auth
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return None
+        old_session_id = user.session_id
+        session_id = _generate_uuid()
+        await self._db.update_user(user.id, session_id=session_id)
+        if old_session_id is not None:
+            self.session_cache.discard(old_session_id)
+        self.session_cache.put(session_id, user.id, user.email)
+        return session_id
+
+    async def get_user_from_session_id(
+            self, session_id: str) -> Union[User, None]:
+        """
+        Return the user of a session_id, None if there is none, see Auth
+        """
+        if session_id is None:
+            return None
+        cached = self.session_cache.get(session_id)
+        if cached is not None:
+            return User(id=cached[0], email=cached[1], session_id=session_id)
+        generation = self.session_cache.generation
+        try:
+            user = await self._db.find_user_by(session_id=session_id)
+        except NoResultFound:
+            return None
+        self.session_cache.put(session_id, user.id, user.email, generation)
+        return user
+
+    async def destroy_session(self, user_id: int) -> None:
+        """
+        Destroy the session of a user, see Auth
+        """
+        try:
+            user = await self._db.find_user_by(id=user_id)
+        except NoResultFound:
+            return None
+        await self._db.update_user(user.id, session_id=None)
+        if user.session_id is not None:
+            self.session_cache.discard(user.session_id)
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """
+        Generate a reset_token for the user of email, see Auth
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            raise ValueError
+        reset_token = _generate_uuid()
+        await self._db.update_user(user.id, reset_token=reset_token)
+        return reset_token
+
+    async def update_password(self, reset_token: str, password: str) -> None:
+        """
+        Update the password of the user of reset_token, see Auth
+        """
+        try:
+            user = await self._db.find_user_by(reset_token=reset_token)
+        except NoResultFound:
+            raise ValueError
+        new_pass = await _hash_password(password)
+        await self._db.update_user(user.id, hashed_password=new_pass,
+                                   reset_token=None)
+        if user.session_id is not None:
+            self.session_cache.discard(user.session_id)
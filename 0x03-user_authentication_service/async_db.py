@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""AsyncDB module: asyncio counterpart of db.DB
+"""
+import asyncio
+import os
+from sqlalchemy import event, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from db import SCHEMA_RACE_ERRORS, _int_env, _set_sqlite_pragmas, migrate
+from user import User
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+
+def async_database_url(database_url: str) -> str:
+    """
+    Use the aiosqlite driver for SQLite URLs given without a driver
+    """
+    if database_url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + database_url[len("sqlite://"):]
+    return database_url
+
+
+class AsyncDB:
+    """AsyncDB class"""
+
+    def __init__(self, database_url: str = None) -> None:
+        """
+        Initialize a new AsyncDB instance, see db.DB
+        Args:
+            database_url (str): SQLAlchemy URL, AUTH_DB_URL or
+                                sqlite:///a.db if None
+        """
+        if database_url is None:
+            database_url = os.getenv("AUTH_DB_URL", "sqlite:///a.db")
+        database_url = async_database_url(database_url)
+        if database_url.startswith("sqlite+aiosqlite") and aiosqlite is None:
+            raise ImportError("SQLite databases need the aiosqlite driver: "
+                              "pip3 install aiosqlite")
+        options = {"echo": False, "pool_pre_ping": True}
+        sqlite = database_url.startswith("sqlite")
+        if sqlite and database_url.split("://", 1)[1] in ("", "/:memory:"):
+            options["poolclass"] = StaticPool
+        else:
+            options["poolclass"] = AsyncAdaptedQueuePool
+            options["pool_size"] = _int_env("AUTH_DB_POOL_SIZE", 5)
+            options["max_overflow"] = _int_env("AUTH_DB_MAX_OVERFLOW", 10)
+        if sqlite:
+            options["connect_args"] = {"timeout": 30}
+        self._engine = create_async_engine(database_url, **options)
+        if sqlite:
+            event.listen(self._engine.sync_engine, "connect",
+                         _set_sqlite_pragmas)
+        # one short-lived session per operation: nothing is shared
+        # between the coroutines of concurrent requests
+        self._sessionmaker = sessionmaker(self._engine, class_=AsyncSession,
+                                          expire_on_commit=False)
+
+    async def init_schema(self, attempts: int = 5) -> None:
+        """
+        Bring the schema up to date, see DB._init_schema
+        """
+        for attempt in range(attempts):
+            try:
+                async with self._engine.begin() as connection:
+                    await connection.run_sync(migrate)
+                return
+            except SCHEMA_RACE_ERRORS:
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(0.1 * (attempt + 1))
+
+    async def close(self) -> None:
+        """
+        Close every pooled connection
+        """
+        await self._engine.dispose()
+
+    async def add_user(self, email: str, hashed_password: str) -> User:
+        """
+        Add a new user to the database
+        Args:
+            email (str): The email address of the user
+            hashed_password (str): The hashed password of the user
+        Returns:
+            User: The newly created user
+        """
+        new_user = User(email=email, hashed_password=hashed_password)
+        async with self._sessionmaker() as session:
+            session.add(new_user)
+            await session.commit()
+        return new_user
+
+    async def find_user_by(self, **kwargs) -> User:
+        """
+        Find a user by the given criteria
+        Args:
+            **kwargs: The criteria to search for, all of them must match,
+                      at least one
+        Returns:
+            User: The found user
+        """
+        if not kwargs:
+            raise InvalidRequestError
+        for k in kwargs.keys():
+            if k not in User.__dict__:
+                raise InvalidRequestError
+        async with self._sessionmaker() as session:
+            result = await session.execute(
+                select(User).filter_by(**kwargs).limit(1))
+            user = result.scalars().first()
+        if user is None:
+            raise NoResultFound
+        return user
+
+    async def update_user(self, user_id: int, **kwargs) -> None:
+        """
+        Update a user's attributes
+        Args:
+            user_id (int): user's id
+            kwargs (dict): dict of key, value pairs representing the
+                           attributes to update and the values to update
+                           them with
+        Return:
+            No return value
+        """
+        async with self._sessionmaker() as session:
+            user = await session.get(User, user_id)
+            if user is None:
+                raise ValueError
+            for k, v in kwargs.items():
+                if hasattr(user, k):
+                    setattr(user, k, v)
+                else:
+                    raise ValueError
+            await session.commit()
@@ -2,21 +2,102 @@
 """
 auth module
 """
+import os
+import time
 import bcrypt
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
 from sqlalchemy.orm.exc import NoResultFound
 from uuid import uuid4
-from typing import Union
-from db import DB
+from typing import Callable, Tuple, Union
+from db import DB, _int_env
 from user import User
 
 
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool has no room for another job"""
+
+
+class HashingPool:
+    """
+    Runs bcrypt work on a fixed pool of threads (bcrypt releases the GIL)
+    At most `workers` jobs run and `queue_size` more wait; beyond that,
+    jobs are refused with HashingPoolBusy instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_size: int, rounds: int) -> None:
+        """
+        Initialize the pool
+        Args:
+            workers (int): number of hashing threads
+            queue_size (int): number of jobs allowed to wait for a thread
+            rounds (int): bcrypt cost factor of new hashes
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="bcrypt")
+        self._slots = BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Schedule fn(*args) on the pool
+        Raise:
+            HashingPoolBusy if every thread and queue slot is taken
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolBusy
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) on the pool and wait for its result
+        """
+        return self.submit(fn, *args).result()
+
+    def hashpw(self, password: bytes) -> bytes:
+        """
+        Salt and hash a password
+        """
+        return self.run(bcrypt.hashpw, password, bcrypt.gensalt(self.rounds))
+
+    def checkpw(self, password: bytes, hashed_password: bytes) -> bool:
+        """
+        Check a password against its hash
+        """
+        return self.run(bcrypt.checkpw, password, hashed_password)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the hashing threads once the submitted jobs are done; no job
+        can be submitted afterwards
+        """
+        self._executor.shutdown(wait=wait)
+
+
+_workers = _int_env("AUTH_HASH_WORKERS", os.cpu_count() or 1)
+HASHING_POOL = HashingPool(
+    _workers,
+    _int_env("AUTH_HASH_QUEUE_SIZE", 4 * _workers),
+    _int_env("AUTH_BCRYPT_ROUNDS", 12),
+)
+
+
 def _hash_password(password: str) -> bytes:
     """
     Hashes a password string and returns it in bytes form
     Args:
         password (str): password in string format
     """
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return HASHING_POOL.hashpw(password.encode('utf-8'))
 
 
 def _generate_uuid() -> str:
@@ -26,12 +107,103 @@ def _generate_uuid() -> str:
     return str(uuid4())
 
 
+class SessionCache:
+    """
+    Bounded LRU cache of session_id -> (user id, email) with a TTL
+    Entries are dropped by discard() when a session ends or a password
+    changes. The cache belongs to one process: with several processes, a
+    session destroyed by another one is seen here once the entry expires.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: int = 5) -> None:
+        """
+        Initialize the cache
+        Args:
+            max_size (int): maximum number of entries, 0 disables the cache
+            ttl (int): seconds an entry stays valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, session_id: str) -> Union[Tuple[int, str], None]:
+        """
+        Return:
+            - (user id, email) of session_id, None if not cached
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry[2] < time.monotonic():
+                del self._entries[session_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, session_id: str, user_id: int, email: str,
+            generation: int = None) -> None:
+        """
+        Cache the user of session_id
+        Args:
+            generation (int): value of self.generation read before the
+                              user was looked up; the entry is not stored
+                              if a discard() happened since, as it may
+                              have been about this very session
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[session_id] = (user_id, email,
+                                         time.monotonic() + self.ttl)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, session_id: str) -> None:
+        """
+        Forget session_id
+        """
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(session_id, None)
+
+    def stats(self) -> dict:
+        """
+        Return:
+            - the hit and miss counters and the number of entries
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._entries)}
+
+
 class Auth:
     """Auth class to interact with the authentication database.
     """
 
     def __init__(self):
         self._db = DB()
+        self.session_cache = SessionCache(
+            _int_env("AUTH_SESSION_CACHE_SIZE", 4096),
+            # a logout or password reset done by another worker process is
+            # seen here only once the entry expires: at most TTL seconds
+            _int_env("AUTH_SESSION_CACHE_TTL", 5),
+        )
+
+    def close_db_session(self) -> None:
+        """
+        Release the database session of the current thread
+        """
+        self._db.close_session()
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -65,7 +237,8 @@ class Auth:
             user = self._db.find_user_by(email=email)
         except NoResultFound:
             return False
-        return bcrypt.checkpw(password.encode('utf-8'), user.hashed_password)
+        return HASHING_POOL.checkpw(password.encode('utf-8'),
+                                    user.hashed_password)
 
     def create_session(self, email: str) -> Union[str, None]:
         """
@@ -80,8 +253,12 @@ class Auth:
             user = self._db.find_user_by(email=email)
         except NoResultFound:
             return None
+        old_session_id = user.session_id
         session_id = _generate_uuid()
         self._db.update_user(user.id, session_id=session_id)
+        if old_session_id is not None:
+            self.session_cache.discard(old_session_id)
+        self.session_cache.put(session_id, user.id, user.email)
         return session_id
 
     def get_user_from_session_id(self, session_id: str) -> Union[User, None]:
@@ -91,14 +268,21 @@ class Auth:
         Args:
             session_id (str): session id for user
         Return:
-            user object if found, else None
+            user object if found, else None; a user from the session cache
+            is a detached copy holding only id, email and session_id
         """
         if session_id is None:
             return None
+        cached = self.session_cache.get(session_id)
+        if cached is not None:
+            # detached copy, without hashed_password and reset_token
+            return User(id=cached[0], email=cached[1], session_id=session_id)
+        generation = self.session_cache.generation
         try:
             user = self._db.find_user_by(session_id=session_id)
         except NoResultFound:
             return None
+        self.session_cache.put(session_id, user.id, user.email, generation)
         return user
 
     def destroy_session(self, user_id: int) -> None:
@@ -114,7 +298,10 @@ class Auth:
             user = self._db.find_user_by(id=user_id)
         except NoResultFound:
             return None
+        session_id = user.session_id
         self._db.update_user(user.id, session_id=None)
+        if session_id is not None:
+            self.session_cache.discard(session_id)
 
     def get_reset_password_token(self, email: str) -> str:
         """
@@ -148,3 +335,5 @@ class Auth:
         new_pass = _hash_password(password)
         self._db.update_user(user.id, hashed_password=new_pass,
                              reset_token=None)
+        if user.session_id is not None:
+            self.session_cache.discard(user.session_id)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Side-by-side benchmark of app.py (Flask, threaded) and asgi_app.py (uvicorn)
+Usage: ./bench_asgi.py [idle_connections] [active_clients] [seconds]
+Each server runs on its own temporary SQLite database. The idle connections
+are opened first and kept open when the server allows keep-alive; the
+active clients then request GET /profile as fast as they can.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from typing import Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EMAIL = "bench@holberton.io"
+PASSWD = "b4l0u"
+# app.py listens on port 5000: run its app on another port
+SERVERS = [
+    ("flask", 5010, [sys.executable, "-c", "import app; app.app.run("
+                     "host='127.0.0.1', port=5010, threaded=True)"]),
+    ("asgi", 5011, [sys.executable, "-m", "uvicorn", "asgi_app:app",
+                    "--port", "5011", "--log-level", "warning"]),
+]
+
+
+def start(name: str, port: int, command: list) -> subprocess.Popen:
+    """
+    Start a server in a temporary directory and wait until it answers
+    """
+    env = dict(os.environ, PYTHONPATH=HERE)
+    env.setdefault("AUTH_BCRYPT_ROUNDS", "4")
+    server = subprocess.Popen(command, cwd=tempfile.mkdtemp(), env=env,
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen("http://127.0.0.1:{}/".format(port))
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("{} did not start".format(name))
+
+
+def login(port: int) -> str:
+    """
+    Register the benchmark user and return a session_id
+    """
+    base = "http://127.0.0.1:{}".format(port)
+    form = urllib.parse.urlencode(
+        {"email": EMAIL, "password": PASSWD}).encode()
+    urllib.request.urlopen(base + "/users", form)
+    resp = urllib.request.urlopen(base + "/sessions", form)
+    return resp.headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+
+
+async def get_profile(reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter,
+                      session_id: str) -> Tuple[int, bool]:
+    """
+    Send one GET /profile and read the response
+    Return:
+        the status and whether the server keeps the connection alive
+    """
+    writer.write("GET /profile HTTP/1.1\r\nHost: localhost\r\n"
+                 "Cookie: session_id={}\r\n\r\n".format(session_id).encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    keep_alive = True
+    for line in head.lower().split(b"\r\n"):
+        if line.startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+        elif line == b"connection: close":
+            keep_alive = False
+    await reader.readexactly(length)
+    return int(head.split(b" ", 2)[1]), keep_alive
+
+
+async def active(port: int, session_id: str, deadline: float,
+                 counts: dict) -> None:
+    """
+    Request GET /profile until deadline, on a new connection only when
+    the server closes the current one
+    """
+    writer = None
+    try:
+        while time.monotonic() < deadline:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1",
+                                                               port)
+            status, keep_alive = await get_profile(reader, writer,
+                                                   session_id)
+            counts["ok" if status == 200 else "failed"] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+    except (OSError, asyncio.IncompleteReadError):
+        counts["failed"] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def idle(port: int, session_id: str, opened: list) -> None:
+    """
+    Open a connection, use it once and leave it idle if the server keeps
+    it alive
+    """
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        _, keep_alive = await asyncio.wait_for(
+            get_profile(reader, writer, session_id), 30)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return
+    if keep_alive:
+        opened.append(writer)
+    else:
+        writer.close()
+
+
+async def run(port: int, session_id: str, idle_connections: int,
+              clients: int, seconds: float) -> Tuple[int, dict]:
+    """
+    Hold the idle connections open while the active clients run
+    Return:
+        the number of idle connections kept alive and the request counts
+    """
+    opened = []
+    await asyncio.gather(*[idle(port, session_id, opened)
+                           for _ in range(idle_connections)])
+    counts = {"ok": 0, "failed": 0}
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(*[active(port, session_id, deadline, counts)
+                           for _ in range(clients)])
+    for writer in opened:
+        writer.close()
+    return len(opened), counts
+
+
+if __name__ == "__main__":
+    idle_connections = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    for name, port, command in SERVERS:
+        server = start(name, port, command)
+        try:
+            session_id = login(port)
+            opened, counts = asyncio.run(
+                run(port, session_id, idle_connections, clients, seconds))
+        finally:
+            server.terminate()
+            server.wait()
+        print("{:>5}: {:>5}/{} idle connections, {:>7.1f} req/s "
+              "({} failed)".format(name, opened, idle_connections,
+                                   counts["ok"] / seconds, counts["failed"]))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: login throughput against the number of hashing workers
+Usage: ./bench_login.py [clients] [seconds]
+Runs against a temporary SQLite database; AUTH_BCRYPT_ROUNDS applies.
+"""
+import os
+import sys
+import tempfile
+import time
+from threading import Thread
+
+_tmp = tempfile.mkdtemp()
+os.environ["AUTH_DB_URL"] = "sqlite:///{}/bench.db".format(_tmp)
+
+import auth  # noqa: E402
+from auth import Auth, HashingPool, HashingPoolBusy  # noqa: E402
+
+EMAIL = "bench@holberton.io"
+PASSWD = "b4l0u"
+
+
+def client(AUTH: Auth, deadline: float, counts: dict) -> None:
+    """
+    Log in again and again until deadline, counting outcomes
+    """
+    while time.monotonic() < deadline:
+        try:
+            assert AUTH.valid_login(EMAIL, PASSWD)
+            counts["ok"] += 1
+        except HashingPoolBusy:
+            counts["busy"] += 1
+        finally:
+            AUTH.close_db_session()
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    AUTH = Auth()
+    AUTH.register_user(EMAIL, PASSWD)
+    rounds = auth.HASHING_POOL.rounds
+    workers = 1
+    while workers <= 2 * (os.cpu_count() or 1):
+        auth.HASHING_POOL = HashingPool(workers, clients, rounds)
+        counts = {"ok": 0, "busy": 0}
+        deadline = time.monotonic() + seconds
+        threads = [Thread(target=client, args=(AUTH, deadline, counts))
+                   for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print("{:>2} worker(s): {:>7.1f} logins/s ({} refused)".format(
+            workers, counts["ok"] / seconds, counts["busy"]))
+        workers *= 2
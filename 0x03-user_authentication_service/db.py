@@ -1,32 +1,154 @@
 #!/usr/bin/env python3
 """DB module
 """
-from sqlalchemy import create_engine
+import os
+import time
+from sqlalchemy import (Column, Integer, MetaData, Table, create_engine,
+                        event, func, inspect, select)
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import (IntegrityError, InvalidRequestError,
+                            OperationalError, ProgrammingError)
+from sqlalchemy.pool import QueuePool, StaticPool
+from typing import Callable, Iterable, Tuple, Union
 from user import Base, User
 
 
+def _int_env(name: str, default: int) -> int:
+    """
+    Read an integer setting from the environment
+    """
+    try:
+        return int(os.getenv(name))
+    except Exception:
+        return default
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Put every new SQLite connection in WAL mode, so that readers do not
+    block the writer (and the other way around)
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _create_schema(connection: Connection) -> None:
+    """
+    Migration to version 1: create the missing tables and indexes
+    (databases made before versioning may lack the indexes)
+    """
+    Base.metadata.create_all(connection)
+    for index in User.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+# MIGRATIONS[n] upgrades a database from version n to version n + 1
+MIGRATIONS = [_create_schema]
+SCHEMA_VERSION = len(MIGRATIONS)
+_schema_meta = MetaData()
+_schema_version = Table(
+    "schema_version", _schema_meta,
+    Column("version", Integer, nullable=False),
+)
+
+# errors of a worker that lost a race on the DDL to another one
+SCHEMA_RACE_ERRORS = (OperationalError, IntegrityError, ProgrammingError)
+
+
+def get_schema_version(connection: Connection) -> int:
+    """
+    Version of the schema of the database, 0 if never initialized
+    """
+    if not inspect(connection).has_table(_schema_version.name):
+        return 0
+    version = connection.execute(
+        select(func.max(_schema_version.c.version))).scalar()
+    return version or 0
+
+
+def migrate(connection: Connection) -> None:
+    """
+    Apply the migrations the database lacks and record its new version
+    """
+    version = get_schema_version(connection)
+    if version >= SCHEMA_VERSION:
+        return
+    for migration in MIGRATIONS[version:]:
+        migration(connection)
+    _schema_meta.create_all(connection)
+    connection.execute(_schema_version.delete())
+    connection.execute(_schema_version.insert().values(
+        version=SCHEMA_VERSION))
+
+
 class DB:
     """DB class"""
 
-    def __init__(self) -> None:
-        """Initialize a new DB instance"""
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+    def __init__(self, database_url: str = None, reset: bool = False) -> None:
+        """
+        Initialize a new DB instance
+        Args:
+            database_url (str): SQLAlchemy URL, AUTH_DB_URL or
+                                sqlite:///a.db if None
+            reset (bool): drop every table first (tests)
+        """
+        if database_url is None:
+            database_url = os.getenv("AUTH_DB_URL", "sqlite:///a.db")
+        options = {"echo": False, "pool_pre_ping": True}
+        sqlite = database_url.startswith("sqlite")
+        if sqlite:
+            # connections move between request threads through the pool
+            options["connect_args"] = {"check_same_thread": False,
+                                       "timeout": 30}
+        if sqlite and database_url in ("sqlite://", "sqlite:///:memory:"):
+            # every connection would get its own empty memory database
+            options["poolclass"] = StaticPool
+        else:
+            options["poolclass"] = QueuePool
+            options["pool_size"] = _int_env("AUTH_DB_POOL_SIZE", 5)
+            options["max_overflow"] = _int_env("AUTH_DB_MAX_OVERFLOW", 10)
+        self._engine = create_engine(database_url, **options)
+        if sqlite:
+            event.listen(self._engine, "connect", _set_sqlite_pragmas)
+        if reset:
+            Base.metadata.drop_all(self._engine)
+            _schema_meta.drop_all(self._engine)
+        self._init_schema()
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
+
+    def _init_schema(self, attempts: int = 5) -> None:
+        """
+        Bring the schema up to SCHEMA_VERSION, creating it if missing
+        Workers starting together may race on the DDL: the loser's
+        statement fails, and it checks the version again.
+        """
+        for attempt in range(attempts):
+            try:
+                with self._engine.begin() as connection:
+                    migrate(connection)
+                return
+            except SCHEMA_RACE_ERRORS:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object"""
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        """Session of the current thread"""
+        return self.__session()
+
+    def close_session(self) -> None:
+        """
+        Close the current thread's session and give its connection back
+        to the pool, e.g. at the end of a request
+        """
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """
@@ -39,25 +161,83 @@ class DB:
         """
         new_user = User(email=email, hashed_password=hashed_password)
         self._session.add(new_user)
-        self._session.commit()
+        try:
+            self._session.commit()
+        except Exception:
+            # e.g. the unique email index rejected a duplicate
+            self._session.rollback()
+            raise
         return new_user
 
+    def bulk_add_users(self, users: Iterable[Tuple[str, Union[str, bytes]]],
+                       batch_size: int = 500,
+                       progress: Callable[[int, int], None] = None) -> int:
+        """
+        Add many users in a single transaction
+        Emails already in the database, or seen earlier in users, are
+        skipped: each batch is checked with one IN query and inserted with
+        one executemany.
+        Args:
+            users: (email, hashed_password) pairs, hashed_password being
+                   a bcrypt hash
+            batch_size (int): rows per query (SQLite allows 999 bound
+                              parameters per query before 3.32)
+            progress: called with (rows read, users added) after each batch
+        Returns:
+            int: number of users added
+        """
+        session = self._session
+        table = User.__table__
+        read = added = 0
+        batch = {}
+        users = iter(users)
+        try:
+            while True:
+                for email, hashed_password in users:
+                    read += 1
+                    if isinstance(hashed_password, str):
+                        hashed_password = hashed_password.encode("utf-8")
+                    batch.setdefault(email, hashed_password)
+                    if len(batch) >= batch_size:
+                        break
+                if not batch:
+                    break
+                existing = session.execute(
+                    select(table.c.email).where(table.c.email.in_(batch)))
+                for (email,) in existing:
+                    del batch[email]
+                if batch:
+                    session.execute(table.insert(), [
+                        {"email": email, "hashed_password": hashed_password}
+                        for email, hashed_password in batch.items()])
+                    added += len(batch)
+                batch = {}
+                if progress is not None:
+                    progress(read, added)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return added
+
     def find_user_by(self, **kwargs) -> User:
         """
         Find a user by the given criteria
         Args:
-            **kwargs: The criteria to search for
+            **kwargs: The criteria to search for, all of them must match,
+                      at least one
         Returns:
             User: The found user
         """
-        all_users = self._session.query(User)
-        for k, v in kwargs.items():
+        if not kwargs:
+            raise InvalidRequestError
+        for k in kwargs.keys():
             if k not in User.__dict__:
                 raise InvalidRequestError
-            for usr in all_users:
-                if getattr(usr, k) == v:
-                    return usr
-        raise NoResultFound
+        user = self._session.query(User).filter_by(**kwargs).first()
+        if user is None:
+            raise NoResultFound
+        return user
 
     def update_user(self, user_id: int, **kwargs) -> None:
         """
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Bulk import of users with already hashed passwords
+Usage: ./import_users.py <file> [batch_size]
+<file> is a CSV file with an email,hashed_password header, or a JSONL file
+(.jsonl or .ndjson) of {"email": ..., "hashed_password": ...} objects;
+- reads CSV from the standard input. The database is AUTH_DB_URL, as for
+the app. Progress and throughput are reported on the standard error.
+"""
+import csv
+import json
+import sys
+import time
+from typing import IO, Iterator, Tuple
+from db import DB
+
+
+def read_csv(stream: IO) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the (email, hashed_password) rows of a CSV stream
+    """
+    for row in csv.DictReader(stream):
+        yield row["email"], row["hashed_password"]
+
+
+def read_jsonl(stream: IO) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the (email, hashed_password) rows of a JSONL stream
+    """
+    for line in stream:
+        if line.strip():
+            row = json.loads(line)
+            yield row["email"], row["hashed_password"]
+
+
+def import_users(db: DB, rows: Iterator[Tuple[str, str]],
+                 batch_size: int = 500, out: IO = sys.stderr) -> int:
+    """
+    Add rows to db, reporting progress and throughput on out
+    Returns:
+        int: number of users added
+    """
+    start = time.monotonic()
+    last = {"time": start, "read": 0}
+
+    def progress(read: int, added: int) -> None:
+        now = time.monotonic()
+        last["read"] = read
+        if now - last["time"] >= 1:
+            last["time"] = now
+            out.write("{} read, {} added, {:.0f} rows/s\n".format(
+                read, added, read / (now - start)))
+            out.flush()
+
+    added = db.bulk_add_users(rows, batch_size, progress)
+    elapsed = time.monotonic() - start
+    out.write("{} read, {} added in {:.1f}s, {:.0f} rows/s\n".format(
+        last["read"], added, elapsed, last["read"] / elapsed))
+    return added
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: {} <file> [batch_size]".format(sys.argv[0]))
+    path = sys.argv[1]
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    reader = read_jsonl if path.endswith((".jsonl", ".ndjson")) else read_csv
+    if path == "-":
+        import_users(DB(), reader(sys.stdin), batch_size)
+    else:
+        with open(path, newline="") as stream:
+            import_users(DB(), reader(stream), batch_size)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests of DB.find_user_by and AsyncDB.find_user_by
+    python3 -m unittest test_db
+"""
+import asyncio
+import unittest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm.exc import NoResultFound
+from async_db import AsyncDB
+from db import DB
+
+
+class TestFindUserBy(unittest.TestCase):
+    """Tests of DB.find_user_by"""
+
+    def setUp(self) -> None:
+        """
+        A database in memory holding one user
+        """
+        self.db = DB("sqlite://", reset=True)
+        self.user = self.db.add_user("bob@example.com", "hashed")
+
+    def test_found(self) -> None:
+        """
+        The user matching every criterion is returned
+        """
+        user = self.db.find_user_by(email="bob@example.com")
+        self.assertEqual(user.id, self.user.id)
+
+    def test_not_found(self) -> None:
+        """
+        NoResultFound when no user matches
+        """
+        with self.assertRaises(NoResultFound):
+            self.db.find_user_by(email="alice@example.com")
+
+    def test_invalid_attribute(self) -> None:
+        """
+        InvalidRequestError for an attribute users do not have
+        """
+        with self.assertRaises(InvalidRequestError):
+            self.db.find_user_by(name="bob")
+
+    def test_no_criteria(self) -> None:
+        """
+        InvalidRequestError without criteria, not the first user
+        """
+        with self.assertRaises(InvalidRequestError):
+            self.db.find_user_by()
+
+
+class TestAsyncFindUserBy(unittest.TestCase):
+    """Tests of AsyncDB.find_user_by"""
+
+    def test_no_criteria(self) -> None:
+        """
+        InvalidRequestError without criteria, not the first user
+        """
+        async def find() -> None:
+            db = AsyncDB("sqlite://")
+            try:
+                await db.init_schema()
+                await db.add_user("bob@example.com", "hashed")
+                with self.assertRaises(InvalidRequestError):
+                    await db.find_user_by()
+            finally:
+                await db.close()
+        asyncio.run(find())
+
+
+if __name__ == "__main__":
+    unittest.main()